@@ -0,0 +1,84 @@
+# Cold-start budget check for the Streamlit entry points.
+# Each entry point is measured in a fresh interpreter (like a newly started worker): the time to
+# import it and run its first script pass, excluding Streamlit's own import, and the heavy
+# dependencies it loaded. Heavy dependencies must only load on first use.
+#
+#   python benchmarks/import_budget.py
+#   python benchmarks/import_budget.py --repeat 5 --budget chatbot=1.0
+#
+# Run it from the app directory: the app modules read .streamlit/secrets.toml at import time.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds allowed for importing + the first script pass of each entry point
+DEFAULT_BUDGETS = {"chatbot": 2.0, "education": 1.5}
+# Modules that must not be imported until a feature that needs them is used
+LAZY_MODULES = ["sklearn", "matplotlib", "snowflake.snowpark", "openai"]
+
+# Runs in the child interpreter; prints one JSON line
+_PROBE = """
+import json, runpy, sys, time
+sys.path.insert(0, {app_dir!r})
+import streamlit
+started = time.perf_counter()
+if {as_script!r}:
+    runpy.run_path({path!r}, run_name="__main__")
+else:
+    __import__({entry!r})
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "modules": sorted(m for m in {lazy!r} if m in sys.modules)}}))
+"""
+
+# Entry points that are Streamlit scripts (executed) rather than modules (imported)
+SCRIPTS = {"chatbot": "chatbot.py"}
+
+
+def measure(entry):
+    as_script = entry in SCRIPTS
+    code = _PROBE.format(
+        app_dir=APP_DIR, as_script=as_script, entry=entry, lazy=LAZY_MODULES,
+        path=os.path.join(APP_DIR, SCRIPTS.get(entry, "")),
+    )
+    completed = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"{entry} failed to start:\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the cold-start time of the Streamlit entry points")
+    parser.add_argument("--entries", nargs="+", choices=list(DEFAULT_BUDGETS), default=list(DEFAULT_BUDGETS))
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per entry point (median is used)")
+    parser.add_argument("--budget", nargs="*", default=[], metavar="ENTRY=SECONDS", help="override a budget")
+    args = parser.parse_args()
+
+    budgets = dict(DEFAULT_BUDGETS)
+    for override in args.budget:
+        entry, seconds = override.split("=")
+        budgets[entry] = float(seconds)
+
+    failures = []
+    for entry in args.entries:
+        runs = [measure(entry) for _ in range(args.repeat)]
+        seconds = statistics.median(r["seconds"] for r in runs)
+        loaded = sorted({m for r in runs for m in r["modules"]})
+        print(f"{entry:<12} {seconds:6.3f}s (budget {budgets[entry]:.2f}s)  "
+              f"eagerly imported: {', '.join(loaded) or 'none'}")
+        if seconds > budgets[entry]:
+            failures.append(f"{entry}: {seconds:.3f}s over the {budgets[entry]:.2f}s budget")
+        if loaded:
+            failures.append(f"{entry}: imports {', '.join(loaded)} at startup")
+
+    for failure in failures:
+        print(f"OVER BUDGET {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
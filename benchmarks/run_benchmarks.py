@@ -0,0 +1,203 @@
+# Benchmark harness for the analysis functions in education.py and the geo engine in geo.py.
+# Times each stage (cold: caches cleared, warm: an immediate rerun) and its peak traced memory on
+# synthetic data, writes the results to a JSON baseline and flags regressions against the last one.
+#
+#   python benchmarks/run_benchmarks.py --sizes 1000 100000 1000000
+#   python benchmarks/run_benchmarks.py --sizes 50000000 --stages perform_eda create_visualizations
+#   python benchmarks/run_benchmarks.py --sizes 10000 1000000 --stages geo_index geo_radius geo_nearest
+#
+# Run it from the app directory: the app modules read .streamlit/secrets.toml at import time.
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import matplotlib
+matplotlib.use("Agg")
+
+import charts  # noqa: E402
+import education  # noqa: E402
+import geo  # noqa: E402
+import model_service  # noqa: E402
+import quality  # noqa: E402
+import rollup  # noqa: E402
+from benchmarks.synthetic import generate_enrollment, generate_schools  # noqa: E402
+from schema import SCHOOLS_SCHEMA, normalize_frame  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_SIZES = [1000, 100000, 1000000]
+STAGES = ["clean_data", "perform_eda", "create_visualizations", "interactive_data_filter", "train_and_evaluate_model"]
+# Geo stages run on a synthetic schools list with the same number of rows; cold runs include the index build
+SYDNEY = (-33.87, 151.21)
+GEO_STAGES = {
+    "geo_index": lambda data: geo.get_geo_engine(data),
+    "geo_radius": lambda data: geo.get_geo_engine(data).within_radius(*SYDNEY, 10),
+    "geo_nearest": lambda data: geo.get_geo_engine(data).nearest(*SYDNEY, 25),
+    "geo_bbox": lambda data: geo.get_geo_engine(data).in_bbox(-34.1, 150.9, -33.6, 151.4),
+    "geo_summary": lambda data: geo.get_geo_engine(data).region_summary("POSTCODE"),
+}
+# Differences below these are noise, whatever the relative change
+MIN_REGRESSION_SECONDS = 0.005
+MIN_REGRESSION_BYTES = 1024 ** 2
+
+
+# Headless stand-in for the `st` module used by education.py: display calls do nothing, widgets
+# pick the option that exercises the most code, and charts are really rasterized (by charts.py or here)
+class HeadlessStreamlit:
+    def __init__(self):
+        self.session_state = _SessionState()
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+    def selectbox(self, label, options, *args, **kwargs):
+        return next((o for o in options if o is not None), None)
+
+    def checkbox(self, *args, **kwargs):
+        return True
+
+    def pyplot(self, fig=None, *args, **kwargs):
+        import matplotlib.pyplot as plt
+        (fig or plt.gcf()).savefig(io.BytesIO(), format="png")
+
+    def spinner(self, *args, **kwargs):
+        import contextlib
+        return contextlib.nullcontext()
+
+
+class _SessionState(dict):
+    __getattr__ = dict.get
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+
+_model_dir = None
+
+
+def _clear_caches():
+    global _model_dir
+    rollup._cube_cache.clear()
+    charts.clear_chart_cache()
+    quality._report_cache.clear()
+    geo._engine_cache.clear()
+    model_service._models.clear()
+    model_service._comparisons.clear()
+    # A fresh, empty model registry (away from the app's snapshot directory), so a cold run fits
+    # instead of loading what the last run saved
+    if _model_dir is not None:
+        _model_dir.cleanup()
+    _model_dir = tempfile.TemporaryDirectory(prefix="eduregion-models-")
+    model_service.MODEL_DIR = _model_dir.name
+    model_service.MODEL_INDEX = os.path.join(_model_dir.name, "index.json")
+
+
+def _time(func, data):
+    started = time.perf_counter()
+    func(data)
+    return time.perf_counter() - started
+
+
+# tracemalloc slows allocation-heavy code down, so peak memory gets its own (cold) run
+def _peak_memory(func, data):
+    tracemalloc.start()
+    try:
+        func(data)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(sizes, stages, seed=42):
+    headless = HeadlessStreamlit()
+    education.st = headless
+    charts.st = headless
+    results = {}
+    for rows in sizes:
+        started = time.perf_counter()
+        data = generate_enrollment(rows, seed=seed)
+        # Like frames from load_table, so the caches key on the version rather than hashing every row
+        data.attrs["dataset_version"] = f"synthetic-enrollment-{rows}-{seed}"
+        schools = None
+        if any(stage in GEO_STAGES for stage in stages):
+            schools = normalize_frame(generate_schools(rows, seed=seed)[geo.SCHOOL_COLUMNS], SCHOOLS_SCHEMA)
+            schools.attrs["dataset_version"] = f"synthetic-schools-{rows}-{seed}"
+        print(f"{rows:>12,} rows generated in {time.perf_counter() - started:.2f}s")
+        for stage in stages:
+            if stage in GEO_STAGES:
+                func, stage_data = GEO_STAGES[stage], schools
+            else:
+                func, stage_data = getattr(education, stage), data
+            _clear_caches()
+            cold_seconds = _time(func, stage_data)
+            warm_seconds = _time(func, stage_data)
+            _clear_caches()
+            peak_bytes = _peak_memory(func, stage_data)
+            results[f"{stage}@{rows}"] = {
+                "stage": stage, "rows": rows, "cold_seconds": cold_seconds,
+                "warm_seconds": warm_seconds, "peak_bytes": peak_bytes,
+            }
+            print(f"  {stage:<26} cold {cold_seconds:8.3f}s  warm {warm_seconds:8.3f}s  "
+                  f"peak {peak_bytes / 1024 ** 2:9.1f} MB")
+    return results
+
+
+# Function to compare the new results against the baseline; returns the list of regressions
+def find_regressions(results, baseline, tolerance):
+    regressions = []
+    for key, result in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        for metric in ("cold_seconds", "warm_seconds", "peak_bytes"):
+            old, new = previous.get(metric), result[metric]
+            if not old:
+                continue
+            if new - old < (MIN_REGRESSION_SECONDS if metric.endswith("seconds") else MIN_REGRESSION_BYTES):
+                continue
+            if new > old * (1 + tolerance):
+                regressions.append(f"{key} {metric}: {old:.4g} -> {new:.4g} (+{100 * (new / old - 1):.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the education.py analysis stages on synthetic data")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--stages", nargs="+", choices=STAGES + list(GEO_STAGES), default=STAGES + list(GEO_STAGES))
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown (0.25 = 25%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.stages, seed=args.seed)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f).get("results", {})
+    regressions = find_regressions(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+
+    if args.update_baseline or not baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "results": {**baseline, **results},
+            }, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
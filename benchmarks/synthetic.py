@@ -0,0 +1,105 @@
+# Synthetic data shaped like the two Snowflake tables the app reads:
+# EDUCATIONAL_ENTITY_ENROLLMENT_SUMMARY and ACARA_AUSTRALIAN_SCHOOLS_LIST.
+# Columns are built from integer codes with numpy, so tens of millions of rows stay affordable.
+import numpy as np
+import pandas as pd
+
+INDIAN_STATES = [
+    "Andhra Pradesh", "Arunachal Pradesh", "Assam", "Bihar", "Chhattisgarh", "Goa", "Gujarat", "Haryana",
+    "Himachal Pradesh", "Jharkhand", "Karnataka", "Kerala", "Madhya Pradesh", "Maharashtra", "Manipur",
+    "Meghalaya", "Mizoram", "Nagaland", "Odisha", "Punjab", "Rajasthan", "Sikkim", "Tamil Nadu", "Telangana",
+    "Tripura", "Uttar Pradesh", "Uttarakhand", "West Bengal", "Delhi", "Jammu and Kashmir", "Puducherry",
+    "Chandigarh", "Ladakh", "Lakshadweep", "Andaman and Nicobar Islands", "Dadra and Nagar Haveli",
+]
+LEVELS = ["Ph.D.", "M.Phil.", "Post Graduate", "Under Graduate", "PG Diploma", "Diploma", "Certificate", "Integrated"]
+
+AUSTRALIAN_STATES = {
+    # state: (share of schools, (lat, lon) of the main population centre)
+    "NSW": (0.31, (-33.87, 151.21)), "VIC": (0.24, (-37.81, 144.96)), "QLD": (0.20, (-27.47, 153.03)),
+    "WA": (0.11, (-31.95, 115.86)), "SA": (0.07, (-34.93, 138.60)), "TAS": (0.03, (-42.88, 147.33)),
+    "ACT": (0.02, (-35.28, 149.13)), "NT": (0.02, (-12.46, 130.84)),
+}
+SECTORS = ["Government", "Non-Government"]
+STATUSES = ["Open", "Closed", "Proposed"]
+
+
+def _zipf_codes(rng, rows, categories, exponent=1.1):
+    # Skewed category frequencies, like real enrollment data (a few large states / universities)
+    weights = 1.0 / np.arange(1, categories + 1) ** exponent
+    return rng.choice(categories, size=rows, p=weights / weights.sum()).astype(np.int32)
+
+
+def _categorical(codes, labels):
+    return pd.Categorical.from_codes(codes, categories=labels)
+
+
+# Function to generate an EDUCATIONAL_ENTITY_ENROLLMENT_SUMMARY-shaped frame
+def generate_enrollment(rows, seed=42, as_category=False):
+    rng = np.random.default_rng(seed)
+    n_universities = int(min(max(rows // 50, 20), 5000))
+    n_districts = int(min(max(rows // 20, 50), 20000))
+
+    university_codes = _zipf_codes(rng, rows, n_universities)
+    # Each university belongs to one state; regional centres are mostly in the same state
+    university_state = rng.integers(0, len(INDIAN_STATES), n_universities)
+    state_codes = university_state[university_codes]
+    moved = rng.random(rows) < 0.15
+    center_state_codes = np.where(moved, rng.integers(0, len(INDIAN_STATES), rows), state_codes)
+    district_codes = _zipf_codes(rng, rows, n_districts, exponent=0.8)
+    level_codes = _zipf_codes(rng, rows, len(LEVELS), exponent=0.7)
+
+    male = rng.negative_binomial(2, 0.01, rows).astype(np.int64)
+    female = rng.negative_binomial(2, 0.01, rows).astype(np.int64)
+
+    columns = {
+        "UNIVERSITY_NAME": _categorical(university_codes, [f"University {i:05d}" for i in range(n_universities)]),
+        "UNIVERSITY_STATE": _categorical(state_codes, INDIAN_STATES),
+        "REGIONAL_CENTER_STATE": _categorical(center_state_codes, INDIAN_STATES),
+        "REGIONAL_CENTER_DISTRICT": _categorical(district_codes, [f"District {i:05d}" for i in range(n_districts)]),
+        "LEVEL": _categorical(level_codes, LEVELS),
+        "TOTAL_MALE_ENROLLMENT": male,
+        "TOTAL_FEMALE_ENROLLMENT": female,
+        "TOTAL_ENROLLMENT": male + female,
+    }
+    data = pd.DataFrame(columns)
+    if not as_category:
+        # What conn.query hands back: plain object strings
+        for column in ["UNIVERSITY_NAME", "UNIVERSITY_STATE", "REGIONAL_CENTER_STATE", "REGIONAL_CENTER_DISTRICT", "LEVEL"]:
+            data[column] = data[column].astype(object)
+    return data
+
+
+# Function to generate an ACARA_AUSTRALIAN_SCHOOLS_LIST-shaped frame
+def generate_schools(rows, seed=42, with_geometry=True):
+    rng = np.random.default_rng(seed)
+    states = list(AUSTRALIAN_STATES)
+    shares = np.array([AUSTRALIAN_STATES[s][0] for s in states])
+    state_codes = rng.choice(len(states), size=rows, p=shares / shares.sum())
+    centres = np.array([AUSTRALIAN_STATES[s][1] for s in states])
+
+    # Schools cluster around each state's main centre, with a long rural tail
+    spread = np.where(rng.random(rows) < 0.7, 0.4, 3.0)
+    latitude = np.clip(centres[state_codes, 0] + rng.normal(0, 1, rows) * spread, -43.6, -10.7).round(6)
+    longitude = np.clip(centres[state_codes, 1] + rng.normal(0, 1, rows) * spread, 113.3, 153.6).round(6)
+
+    n_suburbs = int(min(max(rows // 10, 50), 15000))
+    suburb_codes = _zipf_codes(rng, rows, n_suburbs, exponent=0.6)
+    postcodes = (np.array([2000, 3000, 4000, 6000, 5000, 7000, 2600, 800])[state_codes]
+                 + suburb_codes % 1000).astype(np.int32)
+
+    data = pd.DataFrame({
+        "SCHOOL_NAME": pd.Series([f"School {i:08d}" for i in range(rows)], dtype=object),
+        "LATITUDE": latitude,
+        "LONGITUDE": longitude,
+        "SUBURB": _categorical(suburb_codes, [f"Suburb {i:05d}" for i in range(n_suburbs)]).astype(object),
+        "STATE": _categorical(state_codes, states).astype(object),
+        "POSTCODE": postcodes,
+        "SECTOR": _categorical(rng.choice(2, size=rows, p=[0.7, 0.3]), SECTORS).astype(object),
+        "STATUS": _categorical(rng.choice(3, size=rows, p=[0.95, 0.04, 0.01]), STATUSES).astype(object),
+        "PARENT_SCHOOL_ID": np.where(rng.random(rows) < 0.05, rng.integers(0, max(rows, 1), rows), -1),
+    })
+    if with_geometry:
+        point = "POINT(" + data["LONGITUDE"].astype(str) + " " + data["LATITUDE"].astype(str) + ")"
+        data["GEOM"] = point
+        data["GEOLOCATION"] = point
+    return data
@@ -0,0 +1,111 @@
+# Building blocks shared by the app's caches: a thread-safe LRU map for the per-process caches,
+# atomic file writes for the on-disk stores, and de-duplicated background rebuilds.
+import os
+import threading
+from collections import OrderedDict
+
+
+# Thread-safe map that keeps its `max_entries` most recently used entries
+class LRUCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._entries.pop(key, default)
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions}
+
+
+# Function to write a file so that readers (other sessions, other workers) never see it half-written:
+# `write(f)` fills a temporary file next to `path`, which then replaces `path` in one rename
+def atomic_write(path, write, mode="w"):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Unique per writer, so two threads saving the same file cannot interleave in one temporary file
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, mode) as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+# Rebuilds that run on daemon threads, at most one per key at a time. Failures are dropped: callers
+# keep serving what they have and the next request for the key starts a new attempt.
+class BackgroundTasks:
+    def __init__(self, name):
+        self.name = name
+        self._running = set()
+        self._lock = threading.Lock()
+
+    # Function to run func(*args) in the background unless a task for `key` is already running;
+    # returns whether a task was started
+    def start(self, key, func, *args):
+        with self._lock:
+            if key in self._running:
+                return False
+            self._running.add(key)
+
+        def run():
+            try:
+                func(*args)
+            except Exception:
+                pass
+            finally:
+                with self._lock:
+                    self._running.discard(key)
+
+        threading.Thread(target=run, name=f"{self.name}-{key}", daemon=True).start()
+        return True
+
+    def running(self, key):
+        with self._lock:
+            return key in self._running
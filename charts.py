@@ -0,0 +1,118 @@
+# Chart layer for the analysis views.
+# Charts are drawn from the (small) aggregates, never from the raw rows. With the "matplotlib" backend
+# each figure is built with the object-oriented Figure API (no global pyplot state, so concurrent
+# sessions cannot draw into each other's figures) and the rendered PNG/SVG bytes are memoized by a
+# hash of the aggregates, so a rerun on unchanged data only re-sends the image. The "vega" backend
+# hands a Vega-Lite spec to the browser and does no server-side rasterization at all.
+import base64
+import hashlib
+from io import BytesIO
+
+import pandas as pd
+import streamlit as st
+
+from caching import LRUCache
+from tracing import span
+
+CHART_BACKEND = st.secrets.get("CHART_BACKEND", "matplotlib")  # "matplotlib" or "vega"
+CHART_FORMAT = st.secrets.get("CHART_FORMAT", "png")  # "png" or "svg" (matplotlib backend)
+CHART_DPI = int(st.secrets.get("CHART_DPI", 100))
+CHART_CACHE_ENTRIES = int(st.secrets.get("CHART_CACHE_ENTRIES", 64))
+
+_image_cache = LRUCache(CHART_CACHE_ENTRIES)
+
+
+# Function to hash the aggregates a chart is drawn from, together with everything that changes its pixels
+def chart_key(name, *parts, fmt=CHART_FORMAT, dpi=CHART_DPI):
+    digest = hashlib.sha1(f"{name}|{fmt}|{dpi}".encode())
+    for part in parts:
+        if isinstance(part, (pd.Series, pd.DataFrame)):
+            digest.update(pd.util.hash_pandas_object(part, index=True).to_numpy().tobytes())
+            digest.update(repr(getattr(part, "name", None)).encode())
+        else:
+            digest.update(repr(part).encode())
+    return digest.hexdigest()
+
+
+def _cached_image(key, draw, fmt, dpi):
+    image = _image_cache.get(key)
+    if image is not None:
+        return image, True
+
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(12, 6))
+    draw(fig)
+    fig.tight_layout()
+    buffer = BytesIO()
+    fig.savefig(buffer, format=fmt, dpi=dpi)
+    image = buffer.getvalue()
+    _image_cache.put(key, image)
+    return image, False
+
+
+# Function to show rendered image bytes; SVG is sent as-is so the browser scales it
+def _show_image(image, fmt):
+    if fmt == "svg":
+        encoded = base64.b64encode(image).decode()
+        st.markdown(f'<img src="data:image/svg+xml;base64,{encoded}" style="width:100%">', unsafe_allow_html=True)
+    else:
+        st.image(image, width="stretch")
+
+
+def _draw_course_overview(state_counts, gender_totals):
+    def draw(fig):
+        bars, pie = fig.subplots(2, 1)
+        state_counts.plot(kind='bar', ax=bars)
+        bars.set_title('Distribution of Courses by State')
+        bars.set_xlabel('State')
+        bars.set_ylabel('Number of Courses')
+
+        pie.pie(list(gender_totals.values()), labels=list(gender_totals), autopct='%1.1f%%', startangle=140)
+        pie.axis('equal')
+        pie.set_title('Enrollment Trends by Gender')
+    return draw
+
+
+def _vega_course_overview(state_counts, gender_totals):
+    states = state_counts.rename("count").rename_axis("state").reset_index()
+    st.write("Distribution of Courses by State")
+    st.vega_lite_chart(states, {
+        "mark": "bar",
+        "encoding": {
+            "x": {"field": "state", "type": "nominal", "sort": None, "title": "State"},
+            "y": {"field": "count", "type": "quantitative", "title": "Number of Courses"},
+        },
+    }, width="stretch")
+
+    genders = pd.DataFrame({"gender": list(gender_totals), "enrollment": [float(v) for v in gender_totals.values()]})
+    st.write("Enrollment Trends by Gender")
+    st.vega_lite_chart(genders, {
+        "mark": {"type": "arc", "tooltip": True},
+        "encoding": {
+            "theta": {"field": "enrollment", "type": "quantitative", "stack": "normalize"},
+            "color": {"field": "gender", "type": "nominal"},
+        },
+    }, width="stretch")
+
+
+# Function to show the course-distribution bar chart and the gender pie chart.
+#   state_counts  - Series of course counts indexed by state
+#   gender_totals - dict of label -> total enrollment, e.g. {"Male": ..., "Female": ...}
+def show_course_overview(state_counts, gender_totals, backend=None, fmt=None):
+    backend = backend or CHART_BACKEND
+    fmt = fmt or CHART_FORMAT
+    with span("charts.course_overview", backend=backend) as attributes:
+        if backend == "vega":
+            _vega_course_overview(state_counts, gender_totals)
+            return
+        key = chart_key("course_overview", state_counts, sorted(gender_totals.items()), fmt=fmt)
+        image, attributes["cache_hit"] = _cached_image(
+            key, _draw_course_overview(state_counts, gender_totals), fmt, CHART_DPI,
+        )
+        attributes["bytes"] = len(image)
+        _show_image(image, fmt)
+
+
+def clear_chart_cache():
+    _image_cache.clear()
@@ -0,0 +1,80 @@
+# Asynchronous assistant turn: the SQL in the answer starts executing as soon as its closing
+# fence arrives in the stream, while the rest of the model's prose is still being generated.
+import asyncio
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from tracing import bind_context, record_span, span
+
+SQL_TIMEOUT_SECONDS = int(st.secrets.get("SQL_TIMEOUT_SECONDS", 60))
+
+# A complete ```sql ... ``` block; matched against the partial response as it streams in
+SQL_BLOCK_RE = re.compile(r"```sql\n([\s\S]*?)\n```")
+
+_END_OF_STREAM = object()
+
+# Queries run on their own pool so a timed-out query never holds up asyncio.run's shutdown
+_sql_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="chat-sql")
+
+
+# Function to extract the first complete SQL block of a (possibly partial) response
+def extract_sql(response):
+    match = SQL_BLOCK_RE.search(response)
+    return match.group(1) if match else None
+
+
+def _traced_sql(execute_sql, sql):
+    with span("chat.sql", chars=len(sql)):
+        return execute_sql(sql)
+
+
+# Function to run one assistant turn.
+#   chunks       - iterator of text chunks (e.g. response_cache.stream_response); consumed in a worker thread
+#   execute_sql  - blocking callable(sql) -> result; run in a worker thread, bounded by `sql_timeout`
+#   on_text      - callable(response_so_far) invoked on the calling thread after every chunk
+# Returns (response, sql, result, error) where error is None, a TimeoutError or the query's exception.
+async def run_chat_turn(chunks, execute_sql, on_text, sql_timeout=SQL_TIMEOUT_SECONDS):
+    iterator = iter(chunks)
+    response = ""
+    sql = None
+    sql_task = None
+    loop = asyncio.get_running_loop()
+    stream_started_ns = time.time_ns()
+    first_chunk_ms = None
+
+    while True:
+        chunk = await asyncio.to_thread(next, iterator, _END_OF_STREAM)
+        if chunk is _END_OF_STREAM:
+            break
+        if first_chunk_ms is None:
+            first_chunk_ms = round((time.time_ns() - stream_started_ns) / 1e6, 2)
+        response += chunk
+        on_text(response)
+        if sql_task is None:
+            sql = extract_sql(response)
+            if sql is not None:
+                sql_task = loop.run_in_executor(_sql_executor, bind_context(_traced_sql, execute_sql, sql))
+                sql_started_at = loop.time()
+    record_span("chat.stream", stream_started_ns, time.time_ns(),
+                first_chunk_ms=first_chunk_ms, chars=len(response), sql_overlapped=sql_task is not None)
+
+    if sql_task is None:
+        return response, None, None, None
+
+    # The query has been running while the prose streamed; it only gets what is left of its budget
+    remaining = max(sql_timeout - (loop.time() - sql_started_at), 0)
+    try:
+        result = await asyncio.wait_for(sql_task, timeout=remaining)
+    except asyncio.TimeoutError:
+        return response, sql, None, TimeoutError(f"Query did not finish within {sql_timeout} seconds")
+    except Exception as e:
+        return response, sql, None, e
+    return response, sql, result, None
+
+
+# Function to run a chat turn from synchronous (Streamlit script) code
+def run_chat_turn_sync(chunks, execute_sql, on_text, sql_timeout=SQL_TIMEOUT_SECONDS):
+    return asyncio.run(run_chat_turn(chunks, execute_sql, on_text, sql_timeout))
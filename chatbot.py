@@ -1,8 +1,19 @@
+import uuid
 import streamlit as st
-from openai import OpenAI
-import re
-from prompts import get_system_prompt, get_table_context
-from education import load_data_from_snowflake, clean_data, perform_eda, create_visualizations, interactive_data_filter, train_and_evaluate_model
+from prompts import get_system_prompt, get_table_context, DATASET_TABLES
+from loader import current_version_token
+from executor import get_executor, current_session_id
+from sql_cache import cached_query, result_cache
+from result_stream import STREAM_RESULTS, cached_stream_query, render_result_handle
+from response_cache import response_cache, stream_response, store_response
+from context_window import build_context_window
+from entity_index import get_entity_index, render_entity_hint
+from geo import answer_geo_question, get_geo_engine, render_geo_explorer, show_geo_result, GEO_HISTORY_ROWS
+from chat_pipeline import run_chat_turn_sync, SQL_TIMEOUT_SECONDS
+from tracing import start_trace, finish_trace, render_trace_panel, TRACE_PANEL
+
+# Every rerun is one trace; the hot paths below record their spans into it
+start_trace("chatbot")
 
 st.title("📖 EduRegion Explorer")
 
@@ -26,6 +37,9 @@ with st.sidebar.expander("How to Use This App"):
 st.sidebar.title("Additional Machine Learning Features")
 with st.sidebar:
     if st.checkbox("Show Machine Learning Features"):
+        # Imported on first use: the analysis stack is only needed once this section is opened
+        from education import load_data_from_snowflake, clean_data, perform_eda, create_visualizations, interactive_data_filter, train_and_evaluate_model, show_model_comparison
+
         st.subheader("Machine Learning Features")
         
         # Initialize session state variables for data
@@ -34,7 +48,7 @@ with st.sidebar:
         if 'data_cleaned' not in st.session_state:
             st.session_state.data_cleaned = False
 
-        # Load Data
+        # Load Data (session state keeps a reference to the process-wide shared frame, not a copy)
         if st.button("Load Data"):
             st.session_state.data = load_data_from_snowflake()
 
@@ -62,9 +76,23 @@ with st.sidebar:
             st.write(f"Model Mean Squared Error: {mse}")
             st.write(f"Model R² Score: {r2}")
             st.write(f"Model Accuracy: {accuracy_percentage:.2f}%")
+            if st.checkbox("Compare regressors with cross-validation"):
+                show_model_comparison(st.session_state.data)
+
+# Schools explorer: radius / nearest / bounding-box queries and postcode / suburb summaries, run locally
+st.sidebar.title("School Locations")
+if st.sidebar.checkbox("Explore Australian schools"):
+    try:
+        render_geo_explorer(get_geo_engine())
+    except Exception:
+        st.error("The schools list could not be loaded. Please try again shortly.")
 
-# Initialize the chat messages history
-client = OpenAI(api_key=st.secrets.OPENAI_API_KEY)
+# Function to create the OpenAI client once per process (and import the SDK only when a reply is generated)
+@st.cache_resource
+def get_openai_client():
+    from openai import OpenAI
+
+    return OpenAI(api_key=st.secrets.OPENAI_API_KEY)
 
 def add_bg_from_url():
     st.markdown(f"""
@@ -111,33 +139,83 @@ for message in st.session_state.messages:
         st.write(message["content"])
         if "results" in message:
             st.dataframe(message["results"])
+            if message.get("results_total", 0) > len(message["results"]):
+                st.caption(f"First {len(message['results'])} of {message['results_total']} rows")
+        if "result_handle" in message:
+            render_result_handle(message["result_handle"], message["result_key"])
 
 # Generate a new response if the last message is not from the assistant
 if st.session_state.messages and st.session_state.messages[-1]["role"] != "assistant":
     with st.chat_message("assistant"):
-        response = ""
         resp_container = st.empty()
-        for delta in client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": m["role"], "content": m["content"]} for m in st.session_state.messages],
-            stream=True,
-        ):
-            response += (delta.choices[0].delta.content or "")
-            resp_container.markdown(response)
-
-        message = {"role": "assistant", "content": response}
-        # Parse the response for a SQL query and execute if available
-        sql_match = re.search(r"```sql\n([\s\S]*?)\n```", response, re.DOTALL)  # Adjusted regex
-        if sql_match:
-            sql_query = sql_match.group(1)
+        # Only the system prompt and the latest turns (within the token budget) are sent
+        context_messages, context_report = build_context_window(
+            [{"role": m["role"], "content": m["content"]} for m in st.session_state.messages]
+        )
+        # Bound to this session so queries run from the pipeline thread count against its cap
+        conn = get_executor().for_session(current_session_id())
+        table_name = DATASET_TABLES.get(st.session_state.dataset_choice)
+
+        # Names in the question are resolved to their exact stored values (typos included), so the SQL can
+        # use = / IN instead of ILIKE scans. Until the table's entity index is built, nothing is added.
+        entity_index = get_entity_index(table_name, conn) if table_name else None
+        question = st.session_state.messages[-1]["content"]
+        entity_hint = render_entity_hint(entity_index.resolve(question)) if entity_index else None
+        if entity_hint:
+            context_messages = context_messages[:-1] + [{"role": "system", "content": entity_hint}] + context_messages[-1:]
+
+        # "Schools near X" / "schools per postcode" questions on the schools dataset are answered from the
+        # local geo index without generating SQL; other questions (or unknown places) go to the model,
+        # and so do geo questions while the schools list cannot be loaded
+        geo_answer = None
+        if st.session_state.dataset_choice == 'Australian Educational Institutions Insights':
             try:
-                # Execute the SQL query and display results
-                conn = st.connection("snowflake")
-                query_result = conn.query(sql_query)
-                st.dataframe(query_result)
+                geo_answer = answer_geo_question(question, entity_index=entity_index)
+            except Exception:
+                geo_answer = None
 
-            except Exception as e:
-                st.error("The provided query could not be executed. Please ensure it is relevant to the selected dataset.")
+        if geo_answer is not None:
+            response, geo_result = geo_answer
+            resp_container.markdown(response)
+            show_geo_result(geo_result)
+            # History keeps a capped copy, not the whole result (which may be thousands of schools)
+            message = {"role": "assistant", "content": response,
+                       "results": geo_result.head(GEO_HISTORY_ROWS), "results_total": len(geo_result)}
+        else:
+            # Execute the SQL query (or reuse a cached result of the same query on the same data version);
+            # the Snowflake statement timeout cancels it server-side if it overruns
+            # In streaming mode only the first page is waited for; the rest spills to disk in the background
+            def run_sql(sql_query):
+                dataset_version = current_version_token(table_name, conn) if table_name else None
+                if STREAM_RESULTS:
+                    return cached_stream_query(conn, sql_query, dataset_version, timeout=SQL_TIMEOUT_SECONDS)
+                return cached_query(conn, sql_query, dataset_version, timeout=SQL_TIMEOUT_SECONDS)
+
+            # Common questions on the same dataset are replayed from the shared response cache.
+            # The SQL starts running as soon as its closing fence streams in, overlapping the rest of the answer.
+            response, sql_query, query_result, sql_error = run_chat_turn_sync(
+                stream_response(get_openai_client(), context_messages, st.session_state.dataset_choice),
+                run_sql,
+                resp_container.markdown,
+            )
+            # Only answers whose SQL ran are kept for other users; a failed one is dropped from the cache
+            store_response(context_messages, st.session_state.dataset_choice, response, succeeded=sql_error is None)
+            if context_report["saved_tokens"]:
+                st.caption(f"Context: {context_report['sent_tokens']} tokens sent, "
+                           f"{context_report['saved_tokens']} saved by windowing")
+
+            message = {"role": "assistant", "content": response}
+            if sql_query:
+                if sql_error is None and STREAM_RESULTS:
+                    # History keeps the compact handle (first page + spill file reference), not the full frame
+                    message["result_handle"], message["result_key"] = query_result, uuid.uuid4().hex
+                    render_result_handle(query_result, message["result_key"])
+                elif sql_error is None:
+                    st.dataframe(query_result)
+                elif isinstance(sql_error, TimeoutError):
+                    st.error(f"The query took longer than {SQL_TIMEOUT_SECONDS} seconds and was stopped. Try narrowing the question.")
+                else:
+                    st.error("The provided query could not be executed. Please ensure it is relevant to the selected dataset.")
 
         st.session_state.messages.append(message)
 
@@ -150,3 +228,8 @@ if st.sidebar.button("Submit Rating"):
     st.sidebar.markdown(
     "Do visit my [Github Repository](https://github.com/MohamedFarhun/snowflake_hackathon_-EduRegion-Explorer/tree/main)"
 ) 
+
+# Profiling panel: where the time of this rerun went (loads, queries, cache hits/misses)
+trace = finish_trace()
+if TRACE_PANEL and st.sidebar.checkbox("Show profiling panel", value=True):
+    render_trace_panel(trace, get_executor(), caches={"SQL results": result_cache, "Chat responses": response_cache})
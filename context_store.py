@@ -0,0 +1,131 @@
+# Persistent on-disk store of the table context used to build the system prompts.
+# Records are keyed by table name and validated by a schema fingerprint, so a fresh worker
+# serves the prompt from disk instead of querying INFORMATION_SCHEMA and the metadata GROUP BY.
+import hashlib
+import json
+import os
+import threading
+import time
+
+import streamlit as st
+
+from caching import BackgroundTasks, atomic_write
+from executor import backend_of, get_executor
+from loader import SNAPSHOT_DIR, current_version_token
+from tracing import span
+
+CONTEXT_DIR = os.path.join(SNAPSHOT_DIR, "context")
+# How long a stored context is served before it is revalidated (in the background) against Snowflake
+CONTEXT_REFRESH_SECONDS = int(st.secrets.get("CONTEXT_REFRESH_SECONDS", 3600))
+
+_memory = {}
+_lock = threading.Lock()
+_refreshes = BackgroundTasks("context-refresh")
+
+
+def _record_path(table_name):
+    return os.path.join(CONTEXT_DIR, f"{table_name.replace('.', '_').lower()}.json")
+
+
+def _digest(value):
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def _rows(result):
+    # conn.query returns a DataFrame; older callers handed in lists of dicts
+    if hasattr(result, "to_dict"):
+        return result.to_dict("records")
+    return list(result or [])
+
+
+# Function to fetch the column list of a table from the backend's catalog (INFORMATION_SCHEMA on Snowflake)
+def fetch_columns(conn, table_name):
+    return _rows(conn.query(backend_of(conn).columns_sql(table_name), ttl=0, show_spinner=False))
+
+
+def fetch_metadata(conn, metadata_query):
+    if not metadata_query:
+        return []
+    return _rows(conn.query(metadata_query, ttl=0, show_spinner=False))
+
+
+def schema_fingerprint(table_description, columns):
+    return _digest([table_description, sorted((c.get("COLUMN_NAME"), c.get("DATA_TYPE")) for c in columns)])
+
+
+def _read(table_name):
+    try:
+        with open(_record_path(table_name)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write(record):
+    atomic_write(_record_path(record["table_name"]), lambda f: json.dump(record, f))
+    with _lock:
+        _memory[record["table_name"]] = record
+
+
+# Function to (re)build a record from Snowflake. `render(columns, metadata)` produces the context text.
+# The context is only re-rendered when the schema fingerprint or the metadata counts changed.
+def refresh_record(conn, table_name, table_description, metadata_query, render, previous=None):
+    version = current_version_token(table_name, conn)
+    # Without a version (the version query failed) only the fingerprint and metadata hash can tell
+    if previous and version != "unversioned" and previous.get("version") == version:
+        record = dict(previous, checked_at=time.time())
+        _write(record)
+        return record
+
+    columns = fetch_columns(conn, table_name)
+    metadata = fetch_metadata(conn, metadata_query)
+    fingerprint = schema_fingerprint(table_description, columns)
+    metadata_hash = _digest(metadata)
+    if previous and previous.get("fingerprint") == fingerprint and previous.get("metadata_hash") == metadata_hash:
+        context = previous["context"]
+    else:
+        context = render(columns, metadata)
+
+    record = {
+        "table_name": table_name,
+        "fingerprint": fingerprint,
+        "metadata_hash": metadata_hash,
+        "description_hash": _digest(table_description),
+        "version": version,
+        "context": context,
+        "checked_at": time.time(),
+    }
+    _write(record)
+    return record
+
+
+# Function to get the context text for a table: memory -> disk (revalidated in the background when
+# stale) -> built synchronously only if this worker has never seen the table
+def get_context(table_name, table_description, metadata_query, render, conn=None):
+    with span("prompts.table_context", table=table_name) as attributes:
+        context, attributes["source"] = _get_context(table_name, table_description, metadata_query, render, conn)
+        return context
+
+
+def _get_context(table_name, table_description, metadata_query, render, conn):
+    with _lock:
+        record = _memory.get(table_name)
+    source = "memory"
+    if record is None:
+        record = _read(table_name)
+        source = "disk"
+        if record is not None:
+            with _lock:
+                _memory[table_name] = record
+
+    # A record written for a different table description (i.e. older code) is rebuilt right away
+    if record is None or record.get("description_hash") != _digest(table_description):
+        conn = conn or get_executor()
+        return refresh_record(conn, table_name, table_description, metadata_query, render)["context"], "warehouse"
+
+    if time.time() - record.get("checked_at", 0) > CONTEXT_REFRESH_SECONDS:
+        conn = conn or get_executor()
+        # Keeps serving the stored context meanwhile; a failed refresh is retried by the next stale read
+        _refreshes.start(table_name, refresh_record, conn, table_name, table_description, metadata_query, render, record)
+        source += " (revalidating)"
+    return record["context"], source
@@ -0,0 +1,78 @@
+# Conversation windowing for the chat loop: the system prompt plus the most recent turns are sent,
+# within a token budget; older turns are folded into a short summary (or dropped).
+import streamlit as st
+
+CONTEXT_TOKEN_BUDGET = int(st.secrets.get("CONTEXT_TOKEN_BUDGET", 3000))
+CONTEXT_MAX_MESSAGES = int(st.secrets.get("CONTEXT_MAX_MESSAGES", 12))
+CONTEXT_SUMMARY_TOKENS = int(st.secrets.get("CONTEXT_SUMMARY_TOKENS", 150))
+
+# Every chat message carries a few tokens of framing on top of its content
+MESSAGE_OVERHEAD_TOKENS = 4
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken is optional; fall back to the ~4 characters per token rule of thumb
+    _encoding = None
+
+
+def count_tokens(text):
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def message_tokens(message):
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+# Function to fold dropped turns into one short note: the questions the user asked earlier
+def summarize_turns(messages, max_tokens=CONTEXT_SUMMARY_TOKENS):
+    questions = [" ".join(m["content"].split()[:30]) for m in messages if m["role"] == "user"]
+    if not questions:
+        return None
+    summary = "Earlier in this conversation the user asked: "
+    for question in questions:
+        candidate = summary + question + "; "
+        if count_tokens(candidate) > max_tokens:
+            break
+        summary = candidate
+    if summary.endswith(": "):
+        return None
+    return {"role": "system", "content": summary.rstrip("; ") + "."}
+
+
+# Function to pick the messages to send. Returns (messages, report) where report holds the
+# token counts of the full history and of the window, and how many messages were left out.
+def build_context_window(messages, token_budget=CONTEXT_TOKEN_BUDGET, max_messages=CONTEXT_MAX_MESSAGES,
+                         summarize=True):
+    system = [m for m in messages if m["role"] == "system"][:1]
+    turns = [m for m in messages if m["role"] != "system"]
+
+    budget = token_budget - sum(message_tokens(m) for m in system)
+    if summarize:
+        budget -= CONTEXT_SUMMARY_TOKENS + MESSAGE_OVERHEAD_TOKENS
+
+    # Walk back from the newest turn; the latest message is always kept
+    kept = []
+    for message in reversed(turns):
+        cost = message_tokens(message)
+        if kept and (len(kept) >= max_messages or cost > budget):
+            break
+        kept.append(message)
+        budget -= cost
+    kept.reverse()
+
+    dropped = turns[:len(turns) - len(kept)]
+    summary = summarize_turns(dropped) if summarize and dropped else None
+    window = system + ([summary] if summary else []) + kept
+
+    full_tokens = sum(message_tokens(m) for m in messages)
+    sent_tokens = sum(message_tokens(m) for m in window)
+    report = {
+        "full_tokens": full_tokens,
+        "sent_tokens": sent_tokens,
+        "saved_tokens": max(full_tokens - sent_tokens, 0),
+        "dropped_messages": len(dropped),
+    }
+    return window, report
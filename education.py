@@ -1,108 +1,107 @@
 # Import necessary libraries
+import pandas as pd
 import streamlit as st
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import mean_squared_error, r2_score
-
+from loader import load_table
+from executor import get_executor
+from schema import ENROLLMENT_SCHEMA, normalize_frame, format_memory_report
+from pushdown import ENROLLMENT_TABLE, get_engine
+from model_service import get_model, compare_models
+from charts import show_course_overview
+from quality import clean_frame, column_summary
+from tracing import traced, start_trace, finish_trace, render_trace_panel, TRACE_PANEL
+
+# Columns the analysis and model functions actually read
+ENROLLMENT_COLUMNS = list(ENROLLMENT_SCHEMA)
+
+@traced("education.load_data")
 def load_data_from_snowflake():
     # Define the table name from your Snowflake database
-    table_name = "HACKATHONS.EDUCATION_ANALYSIS.EDUCATIONAL_ENTITY_ENROLLMENT_SUMMARY"
-
-    # Establish a connection to Snowflake
-    conn = st.connection("snowflake")
+    table_name = ENROLLMENT_TABLE
 
-    # Query the table and load data
-    query = f"SELECT * FROM {table_name}"
-    data = conn.query(query)
+    # Served from the in-process cache / local Parquet snapshot when the table has not changed,
+    # otherwise only the new rows (or, failing that, the needed columns) are pulled from Snowflake.
+    # The frame is normalized to categoricals / unsigned counts and shared by all sessions.
+    data = load_table(table_name, columns=ENROLLMENT_COLUMNS, transform=normalize_frame)
 
     st.dataframe(data.head())
+    if "memory_report" in data.attrs:
+        st.caption(format_memory_report(data.attrs["memory_report"]))
     return data
 
 # Function for data cleaning
+# One vectorized profiling/cleaning pass (see quality.py), computed once per dataset version
+@traced("education.clean_data")
 def clean_data(data):
     st.subheader('Data Cleaning')
-    # Checking for missing values
-    missing_values = data.isnull().sum()
-
-    # Verifying data types
-    data_types = data.dtypes
-
-    # Checking for duplicate entries
-    duplicate_entries = data.duplicated().sum()
-
-     # Data Cleaning Summary
-    cleaning_summary = {
-    "Missing Values": missing_values,
-    "Data Types": data_types,
-    "Duplicate Entries": duplicate_entries
-    }
-    st.dataframe(cleaning_summary)
+    data_clean, report = clean_frame(data)
+
+    # Data Cleaning Summary
+    st.dataframe(column_summary(report))
+    st.write({
+        "Duplicate Entries": report["duplicates"],
+        "Rows without enrollment figures": report["empty_rows"],
+        "Totals derived from male + female": report["imputed_totals"],
+        "Totals != male + female": report["inconsistent_totals"],
+        "Name spellings merged": report["merged_names"],
+    })
+    if report["inconsistent_examples"]:
+        st.caption("Rows whose TOTAL_ENROLLMENT differs from male + female:")
+        st.dataframe(pd.DataFrame(report["inconsistent_examples"]))
+    st.caption(f"{report['rows_in']} rows in, {report['rows_out']} rows after cleaning")
     st.session_state.data_cleaned = True
-    return data
+    return data_clean
 
 # Function for Exploratory Data Analysis
-def perform_eda(data):
+# `engine` is "pandas" (rollup cube of the loaded frame) or "warehouse" (SQL pushed down to Snowflake);
+# it defaults to the ANALYSIS_ENGINE setting. The same applies to the two functions below.
+@traced("education.perform_eda")
+def perform_eda(data, engine=None):
+    engine = get_engine(data, engine)
 
     # Descriptive statistics
     st.write("Descriptive Statistics:")
-    st.dataframe(data.describe())
+    st.dataframe(engine.describe())
 
     # Breakdown of enrollment by course level
     st.write("Enrollment by Course Level:")
-    enrollment_by_level = data.groupby('LEVEL')[['TOTAL_MALE_ENROLLMENT', 'TOTAL_FEMALE_ENROLLMENT', 'TOTAL_ENROLLMENT']].sum()
+    enrollment_by_level = engine.group_sum('LEVEL', ['TOTAL_MALE_ENROLLMENT', 'TOTAL_FEMALE_ENROLLMENT', 'TOTAL_ENROLLMENT'])
     st.dataframe(enrollment_by_level)
 
 # Function for creating visualizations
-def create_visualizations(data):
-    import matplotlib.pyplot as plt
-    import seaborn as sns
+@traced("education.create_visualizations")
+def create_visualizations(data, engine=None, chart_backend=None):
+    # All aggregates below come from the engine: rollup cube slices or pushed-down SQL
+    engine = get_engine(data, engine)
 
     # EDA 1: Distribution of courses by state
-    state_course_distribution = data['UNIVERSITY_STATE'].value_counts()
+    state_course_distribution = engine.counts('UNIVERSITY_STATE')
 
     # EDA 2: Enrollment trends by gender
-    total_male_enrollment = data['TOTAL_MALE_ENROLLMENT'].sum()
-    total_female_enrollment = data['TOTAL_FEMALE_ENROLLMENT'].sum()
-
-    # EDA 3: Comparison of course levels in terms of total enrollment
-    course_level_enrollment = data.groupby('LEVEL')['TOTAL_ENROLLMENT'].sum().sort_values(ascending=False)
-
-    # Visualization
-    plt.figure(figsize=(12, 6))
-    plt.subplot(2, 1, 1)
-    state_course_distribution.plot(kind='bar')
-    plt.title('Distribution of Courses by State')
-    plt.xlabel('State')
-    plt.ylabel('Number of Courses')
-
-    plt.subplot(2, 1, 2)
-    labels = ['Male', 'Female']
-    sizes = [total_male_enrollment, total_female_enrollment]
-    plt.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=140)
-    plt.axis('equal')  
-    plt.title('Enrollment Trends by Gender')
+    totals = engine.totals(['TOTAL_MALE_ENROLLMENT', 'TOTAL_FEMALE_ENROLLMENT'])
+    gender_totals = {'Male': totals['TOTAL_MALE_ENROLLMENT'], 'Female': totals['TOTAL_FEMALE_ENROLLMENT']}
 
     # State-wise total enrollment
     st.write("State-wise Total Enrollment:")
-    state_wise_enrollment = data.groupby('UNIVERSITY_STATE')['TOTAL_ENROLLMENT'].sum()
+    state_wise_enrollment = engine.group_sum('UNIVERSITY_STATE', ['TOTAL_ENROLLMENT'])['TOTAL_ENROLLMENT']
     st.bar_chart(state_wise_enrollment)
 
-    plt.tight_layout()
-    st.pyplot(plt)
-    plt.close()
-    pass
+    # Visualization (rendered images are reused while the aggregates are unchanged)
+    show_course_overview(state_course_distribution, gender_totals, backend=chart_backend)
 
 # Function for Interactive Data Filter
-def interactive_data_filter(data):
+@traced("education.interactive_data_filter")
+def interactive_data_filter(data, engine=None):
     st.subheader("Interactive Data Filter")
 
+    engine = get_engine(data, engine)
+
     # User selects a state (None as default)
-    state = st.selectbox("Select a State", options=[None] + list(data['UNIVERSITY_STATE'].unique()))
+    state = st.selectbox("Select a State", options=[None] + engine.distinct('UNIVERSITY_STATE'))
 
     # Only filter and show data if a state is selected
     if state is not None:
         # Data filtered based on the state selection
-        filtered_data = data[data['UNIVERSITY_STATE'] == state]
+        filtered_data = engine.rows({'UNIVERSITY_STATE': state})
         
         # Displaying filtered data
         st.dataframe(filtered_data)
@@ -110,14 +109,14 @@ def interactive_data_filter(data):
         # Further analysis and visualizations on the filtered data
         # Example: Gender distribution in the selected state
         if st.checkbox(f"Show Gender Distribution in {state}"):
-            gender_distribution_state = filtered_data.groupby('LEVEL')[['TOTAL_MALE_ENROLLMENT', 'TOTAL_FEMALE_ENROLLMENT']].sum()
+            gender_distribution_state = engine.group_sum('LEVEL', ['TOTAL_MALE_ENROLLMENT', 'TOTAL_FEMALE_ENROLLMENT'], where={'UNIVERSITY_STATE': state})
             st.bar_chart(gender_distribution_state)
 
 # Function to encode categorical variables for the model
 def encode_categorical(data):
-    # Example: Convert 'State of University' to numeric codes
-    data['State_Code'] = data['UNIVERSITY_STATE'].astype('category').cat.codes
-    return data
+    # Example: Convert 'State of University' to numeric codes.
+    # Returns a new frame: the loaded data is shared between sessions and must not be mutated.
+    return data.assign(State_Code=data['UNIVERSITY_STATE'].astype('category').cat.codes)
 
 # Function to prepare data for modeling
 def prepare_data_for_modeling(data):
@@ -128,34 +127,41 @@ def prepare_data_for_modeling(data):
     X = data[['State_Code', 'TOTAL_MALE_ENROLLMENT', 'TOTAL_FEMALE_ENROLLMENT']]  # Add more features as needed
     y = data['TOTAL_ENROLLMENT']
     
+    from sklearn.model_selection import train_test_split
+
     return train_test_split(X, y, test_size=0.3, random_state=42)
 
 # Function to train and evaluate the model
+@traced("education.train_and_evaluate_model")
 def train_and_evaluate_model(data):
-    X_train, X_test, y_train, y_test = prepare_data_for_modeling(data)
-    
-    # Training the model
-    model = LinearRegression()
-    model.fit(X_train, y_train)
-
-    # Predicting and evaluating
-    y_pred = model.predict(X_test)
-    mse = mean_squared_error(y_test, y_pred)
-    r2 = r2_score(y_test, y_pred)
+    # Served from the model registry: fitted once per dataset version from OLS sufficient statistics,
+    # updated incrementally when rows are appended, and persisted to disk with its encoder and metrics
+    record = get_model(data)
+    mse = record["metrics"]["mse"]
+    r2 = record["metrics"]["r2"]
 
     # Get the model's name
-    model_name = type(model).__name__
+    model_name = type(record["model"]).__name__
     
     # Considering R² as the 'accuracy' of the regression model
     accuracy_percentage = r2 * 100
 
     return mse, r2,accuracy_percentage,model_name
 
+# Function to compare richer regressors with k-fold cross-validation (folds run in parallel processes)
+@traced("education.show_model_comparison")
+def show_model_comparison(data):
+    with st.spinner("Cross-validating regressors..."):
+        summary, wall_clock = compare_models(data)
+    st.dataframe(summary)
+    st.caption(f"Wall-clock time: {wall_clock:.2f}s for {summary['fit_seconds'].sum():.2f}s of fitting")
+
 if 'data_cleaned' not in st.session_state:
     st.session_state.data_cleaned = False
 
 # Streamlit App
 def main():
+    start_trace("education")
     st.title('SnowFlake Hackathon')
     st.header('Theme :- Education')
     st.header("Problem statement :- Education in Regional Languages Data Analysis")
@@ -184,9 +190,15 @@ def main():
             st.write(f"Model Mean Squared Error: {mse}")
             st.write(f"Model R² Score: {r2}")
             st.write(f"Model Accuracy : {accuracy_percentage:.2f}%")
+            if st.checkbox("Compare regressors with cross-validation"):
+                show_model_comparison(data_clean)
         else:
             # Prompt the user to clean the data first
             st.error("Please check the 'Clean Data' checkbox and re-run the analysis before running the prediction model.")
 
+    trace = finish_trace()
+    if TRACE_PANEL and st.sidebar.checkbox("Show profiling panel", value=True):
+        render_trace_panel(trace, get_executor())
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,235 @@
+# Local index of the entity names the chatbot is asked about (universities, districts, suburbs, schools).
+# The distinct values of each entity column are indexed by character trigram, persisted next to the
+# table snapshots and rebuilt when the table's version changes. Names mentioned in a question (even
+# misspelled) resolve to their exact stored values, so the generated SQL can filter with = / IN
+# instead of scanning the table with ILIKE '%keyword%'.
+import hashlib
+import os
+import re
+import threading
+from difflib import SequenceMatcher
+
+import numpy as np
+import streamlit as st
+
+from caching import BackgroundTasks, atomic_write
+from executor import get_executor
+from loader import SNAPSHOT_DIR, current_version_token
+from tracing import span
+
+ENTITY_DIR = os.path.join(SNAPSHOT_DIR, "entities")
+# Share of a name's (IDF-weighted) trigrams that must appear in the question for it to count as mentioned
+ENTITY_MATCH_THRESHOLD = float(st.secrets.get("ENTITY_MATCH_THRESHOLD", 0.6))
+ENTITY_MAX_MATCHES = int(st.secrets.get("ENTITY_MAX_MATCHES", 5))
+# A name's words must each match a whole word of the question: exactly when shorter than this,
+# otherwise with at least ENTITY_WORD_SIMILARITY (so "univrsity" still matches "university")
+ENTITY_FUZZY_MIN_CHARS = int(st.secrets.get("ENTITY_FUZZY_MIN_CHARS", 5))
+ENTITY_WORD_SIMILARITY = float(st.secrets.get("ENTITY_WORD_SIMILARITY", 0.8))
+
+# Entity columns of each table (by unqualified table name)
+ENTITY_COLUMNS = {
+    "EDUCATIONAL_ENTITY_ENROLLMENT_SUMMARY": ["UNIVERSITY_NAME", "REGIONAL_CENTER_DISTRICT"],
+    "ACARA_AUSTRALIAN_SCHOOLS_LIST": ["SUBURB", "SCHOOL_NAME"],
+}
+
+_indexes = {}
+_lock = threading.Lock()
+_builds = BackgroundTasks("entity-index")
+
+
+# Function to normalize a name or question for matching: case-folded, punctuation dropped, spaces collapsed
+def normalize_text(text):
+    return " ".join(re.sub(r"[^\w\s]", " ", str(text).casefold()).split())
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _word_matches(word, question_words):
+    if word in question_words:
+        return True
+    if len(word) < ENTITY_FUZZY_MIN_CHARS:
+        return False
+    return any(abs(len(word) - len(other)) <= 2 and SequenceMatcher(None, word, other).ratio() >= ENTITY_WORD_SIMILARITY
+               for other in question_words)
+
+
+# Function to check that a name is mentioned as whole words, not as pieces of other words: trigrams
+# cross word boundaries, so "Una" is covered by "Nagarjuna" without being mentioned. Words of one or
+# two letters ("of", "&") may be left out unless the name has nothing else.
+def mentions_words(name, question_words):
+    words = normalize_text(name).split()
+    required = [w for w in words if len(w) > 2] or words
+    return bool(required) and all(_word_matches(w, question_words) for w in required)
+
+
+# Trigram index of one column's distinct values, stored as sorted grams + CSR postings
+class ColumnIndex:
+    def __init__(self, values, grams, offsets, ids):
+        self.values = values
+        self.grams = grams
+        self.offsets = offsets
+        self.ids = ids
+        # Rare trigrams identify a name; ones shared by most names ("uni", "sch") count for little
+        document_frequency = np.diff(offsets)
+        self.gram_weights = np.log((len(values) + 1) / (document_frequency + 0.5))
+        self.value_weights = np.bincount(ids, weights=np.repeat(self.gram_weights, document_frequency),
+                                         minlength=len(values))
+
+    @classmethod
+    def build(cls, values):
+        values = np.array(sorted({str(v) for v in values if v is not None and str(v).strip()}), dtype=str)
+        postings = {}
+        for value_id, value in enumerate(values):
+            for gram in _trigrams(normalize_text(value)):
+                postings.setdefault(gram, []).append(value_id)
+        grams = np.array(sorted(postings), dtype=str)
+        counts = np.array([len(postings[g]) for g in grams], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        ids = np.array([i for g in grams for i in postings[g]], dtype=np.int32)
+        return cls(values, grams, offsets, ids)
+
+    # Function to score every value by the weighted share of its trigrams found in `text`
+    def coverage(self, text):
+        query = np.array(sorted(_trigrams(normalize_text(text))), dtype=str)
+        if not len(self.grams) or not len(query):
+            return np.zeros(len(self.values))
+        position = np.searchsorted(self.grams, query)
+        found = position < len(self.grams)
+        found[found] = self.grams[position[found]] == query[found]
+        position = position[found]
+        if not len(position):
+            return np.zeros(len(self.values))
+        starts, ends = self.offsets[position], self.offsets[position + 1]
+        hits = np.concatenate([self.ids[start:end] for start, end in zip(starts, ends)])
+        shared = np.bincount(hits, weights=np.repeat(self.gram_weights[position], ends - starts), minlength=len(self.values))
+        return np.divide(shared, self.value_weights, out=np.zeros(len(self.values)), where=self.value_weights > 0)
+
+    # Function to find the values mentioned in a question, best first, as (value, score). The trigram
+    # coverage shortlists candidates; each must then also be mentioned as whole words.
+    def mentioned_in(self, text, threshold=ENTITY_MATCH_THRESHOLD, limit=ENTITY_MAX_MATCHES):
+        scores = self.coverage(text)
+        candidates = np.flatnonzero(scores >= threshold)
+        # Higher coverage first; among equals the longer (more specific) name
+        order = sorted(candidates, key=lambda i: (-round(scores[i], 6), -len(self.values[i])))
+        question_words = set(normalize_text(text).split())
+        found = []
+        for i in order:
+            if mentions_words(self.values[i], question_words):
+                found.append((str(self.values[i]), float(scores[i])))
+                if len(found) == limit:
+                    break
+        return found
+
+
+class EntityIndex:
+    def __init__(self, table_name, version, columns):
+        self.table_name = table_name
+        self.version = version
+        self.columns = columns  # column -> ColumnIndex
+
+    # Function to resolve the names mentioned in a question: {column: [(value, score), ...]}
+    def resolve(self, question, threshold=ENTITY_MATCH_THRESHOLD, limit=ENTITY_MAX_MATCHES):
+        matches = {}
+        for column, index in self.columns.items():
+            found = index.mentioned_in(question, threshold, limit)
+            if found:
+                matches[column] = found
+        return matches
+
+
+def _path(table_name, version):
+    digest = hashlib.sha1(f"{table_name}|{version}".encode()).hexdigest()[:16]
+    return os.path.join(ENTITY_DIR, f"{table_name.replace('.', '_').lower()}__{digest}.npz")
+
+
+def _save(index):
+    path = _path(index.table_name, index.version)
+    arrays = {}
+    for column, column_index in index.columns.items():
+        arrays.update({
+            f"{column}__values": column_index.values, f"{column}__grams": column_index.grams,
+            f"{column}__offsets": column_index.offsets, f"{column}__ids": column_index.ids,
+        })
+    atomic_write(path, lambda f: np.savez_compressed(f, **arrays), mode="wb")
+    # Indexes of older versions of the table are no longer needed
+    prefix = os.path.basename(path).split("__")[0] + "__"
+    for name in os.listdir(ENTITY_DIR):
+        if name.startswith(prefix) and name != os.path.basename(path):
+            try:
+                os.remove(os.path.join(ENTITY_DIR, name))
+            except OSError:
+                pass
+
+
+def _load(table_name, version, columns):
+    try:
+        with np.load(_path(table_name, version)) as arrays:
+            return EntityIndex(table_name, version, {
+                column: ColumnIndex(arrays[f"{column}__values"], arrays[f"{column}__grams"],
+                                    arrays[f"{column}__offsets"], arrays[f"{column}__ids"])
+                for column in columns
+            })
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+# Function to build (and persist) the index of a table from the distinct values of its entity columns
+def build_index(table_name, conn=None, version=None):
+    conn = conn or get_executor()
+    version = version or current_version_token(table_name, conn)
+    columns = ENTITY_COLUMNS[table_name.split(".")[-1].upper()]
+    with span("entity_index.build", table=table_name) as attributes:
+        indexes = {}
+        for column in columns:
+            values = conn.query(f"SELECT DISTINCT {column} FROM {table_name}", ttl=0, show_spinner=False)[column]
+            indexes[column] = ColumnIndex.build(values.tolist())
+        attributes["values"] = sum(len(i.values) for i in indexes.values())
+    index = EntityIndex(table_name, version, indexes)
+    _save(index)
+    with _lock:
+        _indexes[table_name] = index
+    return index
+
+
+# Function to get the index of a table's current version: memory -> disk -> built in the background.
+# Returns None (or, with wait=True, builds synchronously) while no index of the current version exists.
+def get_entity_index(table_name, conn=None, wait=False):
+    columns = ENTITY_COLUMNS.get(table_name.split(".")[-1].upper())
+    if not columns:
+        return None
+    conn = conn or get_executor()
+    version = current_version_token(table_name, conn)
+    with _lock:
+        index = _indexes.get(table_name)
+    if index is not None and index.version == version:
+        return index
+
+    index = _load(table_name, version, columns)
+    if index is not None:
+        with _lock:
+            _indexes[table_name] = index
+        return index
+    if wait:
+        return build_index(table_name, conn, version)
+    # Until it is built, questions keep using ILIKE; a failed build is retried by the next question
+    _builds.start(table_name, build_index, table_name, conn, version)
+    return None
+
+
+# Function to describe resolved names for the system prompt, or None when nothing matched
+def render_entity_hint(matches):
+    if not matches:
+        return None
+    lines = []
+    for column, found in matches.items():
+        values = ", ".join("'" + value.replace("'", "''") + "'" for value, _ in found)
+        lines.append(f"- {column}: {values}")
+    return (
+        "<entities>\nThe question mentions these exact values (misspellings already resolved):\n"
+        + "\n".join(lines)
+        + "\nFilter these columns with = (one value) or IN (several values) using the exact values above, "
+          "not ILIKE.\n</entities>"
+    )
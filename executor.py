@@ -0,0 +1,376 @@
+# Shared query executor: a bounded connection pool with global and per-session concurrency caps,
+# a bounded wait queue (backpressure), query timeouts and per-query metrics.
+# Exposes the same `query(sql, params=...) -> DataFrame` shape as st.connection("snowflake"),
+# so the loader, prompts and chatbot code can use either.
+import collections
+import contextlib
+import queue
+import re
+import sqlite3
+import threading
+import time
+import weakref
+
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+
+from tracing import span
+
+EXECUTOR_BACKEND = st.secrets.get("EXECUTOR_BACKEND", "snowflake")
+# Every pooled connection must see the same database: a file path, or by default one in-memory
+# database shared by the connections of this process
+SQLITE_PATH = st.secrets.get("SQLITE_PATH", "file:eduregion?mode=memory&cache=shared")
+POOL_SIZE = int(st.secrets.get("POOL_SIZE", 4))
+MAX_CONCURRENT_QUERIES = int(st.secrets.get("MAX_CONCURRENT_QUERIES", 4))
+MAX_QUERIES_PER_SESSION = int(st.secrets.get("MAX_QUERIES_PER_SESSION", 2))
+MAX_QUEUED_QUERIES = int(st.secrets.get("MAX_QUEUED_QUERIES", 32))
+QUEUE_TIMEOUT_SECONDS = float(st.secrets.get("QUEUE_TIMEOUT_SECONDS", 30))
+QUERY_TIMEOUT_SECONDS = int(st.secrets.get("QUERY_TIMEOUT_SECONDS", 120))
+
+# Number of recent queries kept for the metrics summary
+METRICS_WINDOW = 500
+
+
+# Raised when the wait queue is full or a slot could not be obtained in time
+class QueryRejected(RuntimeError):
+    pass
+
+
+# Backends: connect() -> raw connection, run(conn, sql, params, timeout) -> DataFrame,
+# run_batches(...) -> iterator of pyarrow.RecordBatch; version_sql / columns_sql(table_name) give the
+# catalog queries for a table's version marker (ROW_COUNT, LAST_ALTERED) and its columns
+# (COLUMN_NAME, DATA_TYPE)
+class SnowflakeBackend:
+    name = "snowflake"
+
+    def version_sql(self, table_name):
+        database, schema, table = table_name.upper().split(".")
+        return f"""
+            SELECT ROW_COUNT, LAST_ALTERED FROM {database}.INFORMATION_SCHEMA.TABLES
+            WHERE TABLE_SCHEMA = '{schema}' AND TABLE_NAME = '{table}'
+            """
+
+    def columns_sql(self, table_name):
+        database, schema, table = table_name.upper().split(".")
+        return f"""
+            SELECT COLUMN_NAME, DATA_TYPE FROM {database}.INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = '{schema}' AND TABLE_NAME = '{table}'
+            ORDER BY ORDINAL_POSITION
+            """
+
+    def connect(self):
+        import snowflake.connector
+        return snowflake.connector.connect(**st.secrets["connections"]["snowflake"])
+
+    def run(self, conn, sql, params, timeout):
+        cur = conn.cursor()
+        try:
+            # The connector cancels the statement server-side once `timeout` is exceeded
+            cur.execute(sql, params=params, timeout=timeout)
+            return cur.fetch_pandas_all()
+        finally:
+            cur.close()
+
+    def run_batches(self, conn, sql, params, timeout, batch_rows):
+        cur = conn.cursor()
+        try:
+            cur.execute(sql, params=params, timeout=timeout)
+            # Batch sizes follow Snowflake's result chunks; batch_rows is not used here
+            empty = True
+            for table in cur.fetch_arrow_batches():
+                for batch in table.to_batches():
+                    empty = False
+                    yield batch
+            if empty:
+                # An empty result yields no Arrow batches at all; the columns still come from the cursor
+                yield empty_batch([d[0] for d in cur.description or []])
+        finally:
+            cur.close()
+
+    def is_broken(self, conn):
+        return conn.is_closed()
+
+    def close(self, conn):
+        conn.close()
+
+
+# Function to build the zero-row batch that stands for an empty result, so consumers still get its columns
+def empty_batch(columns):
+    return pa.RecordBatch.from_arrays([pa.array([], type=pa.null()) for _ in columns], names=columns)
+
+
+# A DATABASE.SCHEMA.TABLE name outside quotes; sqlite has no three-part names
+_QUALIFIED_NAME_RE = re.compile(r'(?<![\w."\'])([A-Za-z_]\w*\.[A-Za-z_]\w*\.[A-Za-z_]\w*)\b(?!["\'])')
+
+
+# Function to translate the app's Snowflake-style SQL for sqlite: pyformat placeholders (%(name)s)
+# become :name and DATABASE.SCHEMA.TABLE becomes the quoted table name "DATABASE.SCHEMA.TABLE"
+def sqlite_sql(sql):
+    sql = re.sub(r"%\((\w+)\)s", r":\1", sql)
+    return _QUALIFIED_NAME_RE.sub(lambda m: f'"{m.group(1).upper()}"', sql)
+
+
+# Local stand-in for tests and offline development. Tables are stored under their full upper-case
+# name, e.g. df.to_sql("DB.SCHEMA.TABLE", sqlite3.connect(SQLITE_PATH, uri=True)).
+class SQLiteBackend:
+    name = "sqlite"
+
+    def __init__(self, path=SQLITE_PATH):
+        # A private ":memory:" database would give every pooled connection its own empty copy
+        self.path = "file:eduregion?mode=memory&cache=shared" if path == ":memory:" else path
+
+    def connect(self):
+        return sqlite3.connect(self.path, check_same_thread=False, uri=True)
+
+    # sqlite keeps no modification time; the row count and the highest rowid stand in for it
+    # (so in-place updates are only picked up once the loader's TTL expires and the frame is reloaded)
+    def version_sql(self, table_name):
+        return f'SELECT COUNT(*) AS ROW_COUNT, COALESCE(MAX(rowid), 0) AS LAST_ALTERED FROM "{table_name.upper()}"'
+
+    def columns_sql(self, table_name):
+        return (f"SELECT name AS COLUMN_NAME, type AS DATA_TYPE FROM pragma_table_info('{table_name.upper()}') "
+                "ORDER BY cid")
+
+    def _arm_timeout(self, conn, timeout):
+        if timeout:
+            deadline = time.monotonic() + timeout
+            conn.set_progress_handler(lambda: int(time.monotonic() > deadline), 10000)
+
+    def run(self, conn, sql, params, timeout):
+        sql = sqlite_sql(sql)
+        self._arm_timeout(conn, timeout)
+        try:
+            return pd.read_sql_query(sql, conn, params=params)
+        finally:
+            conn.set_progress_handler(None, 0)
+
+    def run_batches(self, conn, sql, params, timeout, batch_rows):
+        sql = sqlite_sql(sql)
+        self._arm_timeout(conn, timeout)
+        cur = conn.cursor()
+        try:
+            cur.execute(sql, params or {})
+            columns = [d[0] for d in cur.description or []]
+            empty = True
+            while True:
+                rows = cur.fetchmany(batch_rows)
+                if not rows:
+                    break
+                empty = False
+                yield pa.RecordBatch.from_pandas(pd.DataFrame.from_records(rows, columns=columns), preserve_index=False)
+            if empty:
+                yield empty_batch(columns)
+        finally:
+            cur.close()
+            conn.set_progress_handler(None, 0)
+
+    def is_broken(self, conn):
+        return False
+
+    def close(self, conn):
+        conn.close()
+
+
+class ConnectionPool:
+    def __init__(self, backend, size=POOL_SIZE):
+        self.backend = backend
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def acquire(self, timeout):
+        if not self._slots.acquire(timeout=timeout):
+            raise QueryRejected("No database connection became available in time")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                return self.backend.connect()
+            except Exception:
+                self._slots.release()
+                raise
+
+    def release(self, conn, broken=False):
+        if broken:
+            try:
+                self.backend.close(conn)
+            except Exception:
+                pass
+        else:
+            self._idle.put(conn)
+        self._slots.release()
+
+
+def current_session_id():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+    except Exception:
+        return None
+    return ctx.session_id if ctx else None
+
+
+class QueryExecutor:
+    def __init__(self, backend, pool_size=POOL_SIZE, max_concurrent=MAX_CONCURRENT_QUERIES,
+                 per_session=MAX_QUERIES_PER_SESSION, max_queued=MAX_QUEUED_QUERIES,
+                 queue_timeout=QUEUE_TIMEOUT_SECONDS, query_timeout=QUERY_TIMEOUT_SECONDS):
+        self.backend = backend
+        self.pool = ConnectionPool(backend, pool_size)
+        self.per_session = per_session
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.query_timeout = query_timeout
+        self._global = threading.BoundedSemaphore(max_concurrent)
+        # Per-session slots live only while one of that session's queries holds them
+        self._sessions = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._running = 0
+        self._metrics = collections.deque(maxlen=METRICS_WINDOW)
+        self.rejected = 0
+        self.failed = 0
+
+    # Context manager that waits for a session slot, a global slot and a pooled connection,
+    # yields (conn, record) and releases everything afterwards; `record` collects the metrics
+    @contextlib.contextmanager
+    def _slot(self, sql, session_id):
+        with self._lock:
+            if self._waiting >= self.max_queued:
+                self.rejected += 1
+                raise QueryRejected("Too many queries are waiting; please try again shortly")
+            self._waiting += 1
+            session_slot = None
+            if session_id:
+                session_slot = self._sessions.get(session_id)
+                if session_slot is None:
+                    session_slot = self._sessions[session_id] = threading.BoundedSemaphore(self.per_session)
+
+        queued_at = time.monotonic()
+        acquired = []
+        try:
+            deadline = queued_at + self.queue_timeout
+            for slot in (session_slot, self._global):
+                if slot is None:
+                    continue
+                if not slot.acquire(timeout=max(deadline - time.monotonic(), 0)):
+                    raise QueryRejected("Timed out waiting for a query slot")
+                acquired.append(slot)
+            conn = self.pool.acquire(max(deadline - time.monotonic(), 0))
+        except Exception as e:
+            with self._lock:
+                self._waiting -= 1
+                if isinstance(e, QueryRejected):
+                    self.rejected += 1
+            for slot in acquired:
+                slot.release()
+            raise
+
+        with self._lock:
+            self._waiting -= 1
+            self._running += 1
+        started_at = time.monotonic()
+        record = {"session_id": session_id, "queue_wait_s": started_at - queued_at, "rows": 0, "bytes": 0,
+                  "sql": sql[:200]}
+        broken = False
+        try:
+            yield conn, record
+        except Exception:
+            broken = self.backend.is_broken(conn)
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            record["execution_s"] = time.monotonic() - started_at
+            self.pool.release(conn, broken=broken)
+            for slot in acquired:
+                slot.release()
+            with self._lock:
+                self._running -= 1
+            self._metrics.append(record)
+
+    # Function with the same shape as SnowflakeConnection.query; `ttl`/`show_spinner` are accepted
+    # for compatibility (result caching lives in loader / sql_cache) and ignored
+    def query(self, sql, params=None, timeout=None, session_id=None, ttl=None, show_spinner=None, **kwargs):
+        with span("warehouse.query", backend=self.backend.name) as attributes:
+            with self._slot(sql, session_id or current_session_id()) as (conn, record):
+                result = self.backend.run(conn, sql, params, timeout or self.query_timeout)
+                record["rows"] = len(result)
+                record["bytes"] = int(result.memory_usage(index=True, deep=True).sum())
+            attributes.update(rows=record["rows"], bytes=record["bytes"],
+                              queue_wait_ms=round(record["queue_wait_s"] * 1000, 2))
+        return result
+
+    # Function to stream a result as pyarrow record batches. The connection and the slots are held
+    # until the generator is exhausted or closed, so slow consumers still count against the caps.
+    def query_batches(self, sql, params=None, timeout=None, session_id=None, batch_rows=10000, **kwargs):
+        with self._slot(sql, session_id or current_session_id()) as (conn, record):
+            for batch in self.backend.run_batches(conn, sql, params, timeout or self.query_timeout, batch_rows):
+                record["rows"] += batch.num_rows
+                record["bytes"] += batch.nbytes
+                yield batch
+
+    # Function to bind a session id, for queries issued from threads without a script context
+    def for_session(self, session_id):
+        executor = self
+
+        class _SessionExecutor:
+            backend = executor.backend
+
+            def query(self, sql, **kwargs):
+                kwargs.setdefault("session_id", session_id)
+                return executor.query(sql, **kwargs)
+
+            def query_batches(self, sql, **kwargs):
+                kwargs.setdefault("session_id", session_id)
+                return executor.query_batches(sql, **kwargs)
+
+        return _SessionExecutor()
+
+    def metrics_summary(self):
+        records = list(self._metrics)
+        with self._lock:
+            summary = {
+                "backend": self.backend.name,
+                "running": self._running,
+                "waiting": self._waiting,
+                "rejected": self.rejected,
+                "failed": self.failed,
+                "queries": len(records),
+            }
+        if records:
+            frame = pd.DataFrame(records)
+            summary.update({
+                "queue_wait_p50_s": float(frame["queue_wait_s"].median()),
+                "queue_wait_p95_s": float(frame["queue_wait_s"].quantile(0.95)),
+                "execution_p50_s": float(frame["execution_s"].median()),
+                "execution_p95_s": float(frame["execution_s"].quantile(0.95)),
+                "rows": int(frame["rows"].sum()),
+                "bytes": int(frame["bytes"].sum()),
+            })
+        return summary
+
+    # Function to list the recent queries that waited longest for a slot (who caused a queuing spike)
+    # The metrics cover every session of the process, so the view leaves out whose query it was and its SQL
+    def longest_waits(self, limit=5):
+        records = sorted(self._metrics, key=lambda r: r["queue_wait_s"], reverse=True)[:limit]
+        return pd.DataFrame(records, columns=["queue_wait_s", "execution_s", "rows"])
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+# Function to find the backend behind a connection-like object (plain st.connection objects are Snowflake)
+def backend_of(conn):
+    return getattr(conn, "backend", None) or SnowflakeBackend()
+
+
+# Function to get the process-wide executor for the configured backend
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            backend = SQLiteBackend() if EXECUTOR_BACKEND == "sqlite" else SnowflakeBackend()
+            _executor = QueryExecutor(backend)
+        return _executor
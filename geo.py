@@ -0,0 +1,319 @@
+# Local geo engine for the Australian schools dataset (ACARA_AUSTRALIAN_SCHOOLS_LIST).
+# Schools are loaded once per table version (through the loader's snapshot cache) and bucketed into
+# a uniform latitude/longitude grid sorted by cell id, so a radius, nearest-neighbour or bounding-box
+# query only computes vectorized haversine distances for the points of a few contiguous slices.
+# Per-postcode / per-suburb aggregates come from the same frame. Used by the chatbot for "schools
+# near X" questions and by the schools explorer view.
+import re
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from caching import LRUCache
+from loader import dataset_version, load_table
+from schema import SCHOOLS_SCHEMA, normalize_frame
+from tables import QUALIFIED_TABLE_NAME_2
+from tracing import span
+
+SCHOOLS_TABLE = QUALIFIED_TABLE_NAME_2
+# GEOM / GEOLOCATION repeat LATITUDE / LONGITUDE as text and are not loaded
+SCHOOL_COLUMNS = ["SCHOOL_NAME", "LATITUDE", "LONGITUDE", "SUBURB", "STATE", "POSTCODE", "SECTOR", "STATUS"]
+
+GEO_CELL_DEGREES = float(st.secrets.get("GEO_CELL_DEGREES", 0.1))
+GEO_DEFAULT_RADIUS_KM = float(st.secrets.get("GEO_DEFAULT_RADIUS_KM", 5))
+GEO_DEFAULT_NEIGHBOURS = int(st.secrets.get("GEO_DEFAULT_NEIGHBOURS", 10))
+# Rows of a chat answer kept in the session's message history (the full result is only shown once)
+GEO_HISTORY_ROWS = int(st.secrets.get("GEO_HISTORY_ROWS", 200))
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = np.pi * EARTH_RADIUS_KM / 180
+DISTANCE = "DISTANCE_KM"
+
+# One engine per dataset version, shared by every session of this process
+GEO_CACHE_MAX_ENTRIES = 2
+_engine_cache = LRUCache(GEO_CACHE_MAX_ENTRIES)
+
+
+# Function to compute great-circle distances (km) from one point to arrays of points
+def haversine_km(lat, lon, lats, lons):
+    lat, lon, lats, lons = np.radians(lat), np.radians(lon), np.radians(lats), np.radians(lons)
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+# Uniform grid over latitude/longitude. Points are sorted by cell id (row-major), so the cells of one
+# grid row between two longitudes are one contiguous slice of the sorted arrays.
+class GridIndex:
+    def __init__(self, lats, lons, cell_degrees=GEO_CELL_DEGREES):
+        lats = pd.to_numeric(pd.Series(lats), errors="coerce").to_numpy(dtype=float)
+        lons = pd.to_numeric(pd.Series(lons), errors="coerce").to_numpy(dtype=float)
+        valid = np.isfinite(lats) & np.isfinite(lons) & (np.abs(lats) <= 90) & (np.abs(lons) <= 180)
+        positions = np.flatnonzero(valid)
+        self.cell_degrees = cell_degrees
+        self.n_lon_cells = int(np.ceil(360 / cell_degrees)) + 1
+        cells = self._cell(lats[valid], lons[valid])
+        order = np.argsort(cells, kind="stable")
+        self.cells = cells[order]
+        self.positions = positions[order]  # row positions in the indexed frame
+        self.lats = lats[valid][order]
+        self.lons = lons[valid][order]
+
+    def _cell(self, lats, lons):
+        rows = np.floor((np.asarray(lats) + 90) / self.cell_degrees).astype(np.int64)
+        columns = np.floor((np.asarray(lons) + 180) / self.cell_degrees).astype(np.int64)
+        return rows * self.n_lon_cells + columns
+
+    # Function to find the sorted-array indices of the points in the cells overlapping a box
+    def _candidates(self, south, west, north, east):
+        south, north = max(south, -90), min(north, 90)
+        west, east = max(west, -180), min(east, 180)
+        first_row, last_row = np.floor((np.array([south, north]) + 90) / self.cell_degrees).astype(np.int64)
+        first_column, last_column = np.floor((np.array([west, east]) + 180) / self.cell_degrees).astype(np.int64)
+        rows = np.arange(first_row, last_row + 1) * self.n_lon_cells
+        starts = np.searchsorted(self.cells, rows + first_column, side="left")
+        ends = np.searchsorted(self.cells, rows + last_column, side="right")
+        slices = [np.arange(start, end) for start, end in zip(starts, ends) if end > start]
+        return np.concatenate(slices) if slices else np.array([], dtype=np.int64)
+
+    # Function to find the points inside a box; returns sorted-array indices
+    def bbox(self, south, west, north, east):
+        candidates = self._candidates(south, west, north, east)
+        lats, lons = self.lats[candidates], self.lons[candidates]
+        return candidates[(lats >= south) & (lats <= north) & (lons >= west) & (lons <= east)]
+
+    # Function to find the points within `km` of a point, nearest first; returns (indices, distances)
+    def radius(self, lat, lon, km):
+        dlat = km / KM_PER_DEGREE
+        cos_lat = np.cos(np.radians(lat))
+        dlon = 180 if cos_lat < 1e-6 else min(km / (KM_PER_DEGREE * cos_lat), 180)
+        candidates = self._candidates(lat - dlat, lon - dlon, lat + dlat, lon + dlon)
+        distances = haversine_km(lat, lon, self.lats[candidates], self.lons[candidates])
+        inside = distances <= km
+        candidates, distances = candidates[inside], distances[inside]
+        order = np.argsort(distances, kind="stable")
+        return candidates[order], distances[order]
+
+    # Function to find the k nearest points: the search radius doubles until it holds k points,
+    # at which point they are exactly the k nearest
+    def nearest(self, lat, lon, k):
+        km = max(self.cell_degrees * KM_PER_DEGREE, 1.0)
+        while True:
+            candidates, distances = self.radius(lat, lon, km)
+            if len(candidates) >= k or km >= np.pi * EARTH_RADIUS_KM:
+                return candidates[:k], distances[:k]
+            km *= 2
+
+
+class SchoolsGeo:
+    def __init__(self, data, cell_degrees=GEO_CELL_DEGREES):
+        self.data = data
+        self.index = GridIndex(data["LATITUDE"], data["LONGITUDE"], cell_degrees)
+        self._summaries = {}
+        self._names = self._build_names()
+
+    def _rows(self, indices, distances=None):
+        rows = self.data.iloc[self.index.positions[indices]]
+        if distances is not None:
+            rows = rows.assign(**{DISTANCE: np.round(distances, 3)})
+        return rows
+
+    # Function to list the schools within `km` of a point, nearest first
+    def within_radius(self, lat, lon, km=GEO_DEFAULT_RADIUS_KM):
+        with span("geo.radius", km=km) as attributes:
+            rows = self._rows(*self.index.radius(lat, lon, km))
+            attributes["rows"] = len(rows)
+            return rows
+
+    # Function to list the k schools nearest to a point
+    def nearest(self, lat, lon, k=GEO_DEFAULT_NEIGHBOURS):
+        with span("geo.nearest", k=k):
+            return self._rows(*self.index.nearest(lat, lon, k))
+
+    # Function to list the schools inside a bounding box
+    def in_bbox(self, south, west, north, east):
+        with span("geo.bbox") as attributes:
+            rows = self._rows(self.index.bbox(south, west, north, east))
+            attributes["rows"] = len(rows)
+            return rows
+
+    # Function to aggregate schools per POSTCODE or SUBURB: counts, open / government schools and the
+    # centroid. Without `rows` the whole table is summarized (and cached); otherwise just those rows.
+    def region_summary(self, by="POSTCODE", rows=None):
+        if rows is None and by in self._summaries:
+            return self._summaries[by]
+        source = self.data if rows is None else rows
+        keys = [by, "STATE"] if by == "SUBURB" else [by]
+        grouped = source.assign(
+            OPEN=(source["STATUS"].astype(object) == "Open"),
+            GOVERNMENT=(source["SECTOR"].astype(object) == "Government"),
+            LATITUDE=pd.to_numeric(source["LATITUDE"], errors="coerce"),
+            LONGITUDE=pd.to_numeric(source["LONGITUDE"], errors="coerce"),
+        ).groupby(keys, observed=True, sort=False)
+        summary = grouped.agg(
+            SCHOOLS=("SCHOOL_NAME", "size"), OPEN=("OPEN", "sum"), GOVERNMENT=("GOVERNMENT", "sum"),
+            LATITUDE=("LATITUDE", "mean"), LONGITUDE=("LONGITUDE", "mean"),
+        ).sort_values("SCHOOLS", ascending=False).reset_index()
+        if rows is None:
+            self._summaries[by] = summary
+        return summary
+
+    # Name -> (lat, lon, label) lookup; school names win over suburb names, and for repeated names the
+    # first row (for suburbs: the one with most schools) wins
+    def _build_names(self):
+        schools = self.data[["SCHOOL_NAME", "LATITUDE", "LONGITUDE"]].dropna()[::-1]
+        school_names = schools["SCHOOL_NAME"].astype(str)
+        suburbs = self.region_summary("SUBURB")[::-1]
+        labels = suburbs["SUBURB"].astype(str) + " (" + suburbs["STATE"].astype(str) + ")"
+        names = dict(zip(suburbs["SUBURB"].astype(str).str.casefold().tolist(), zip(
+            suburbs["LATITUDE"].tolist(), suburbs["LONGITUDE"].tolist(), labels.tolist())))
+        names.update(zip(school_names.str.casefold().tolist(), zip(
+            pd.to_numeric(schools["LATITUDE"]).tolist(), pd.to_numeric(schools["LONGITUDE"]).tolist(),
+            school_names.tolist())))
+        return names
+
+    # Function to find the coordinates of a school or suburb by (case-insensitive) name: (lat, lon, label)
+    def locate(self, name):
+        return self._names.get(" ".join(str(name).split()).casefold())
+
+
+# Function to load the schools snapshot (served from the loader's memory / Parquet cache when unchanged)
+def load_schools(conn=None):
+    return load_table(SCHOOLS_TABLE, columns=SCHOOL_COLUMNS, conn=conn,
+                      transform=lambda data: normalize_frame(data, SCHOOLS_SCHEMA))
+
+
+# Function to get the geo engine for this schools data, building the index on first use
+def get_geo_engine(data=None):
+    data = load_schools() if data is None else data
+    version = dataset_version(data)
+    engine = _engine_cache.get(version)
+    if engine is not None:
+        return engine
+
+    with span("geo.build_index", rows=len(data)):
+        engine = SchoolsGeo(data)
+    _engine_cache.put(version, engine)
+    return engine
+
+
+_GEO_INTENT_RE = re.compile(r"\b(near|nearby|nearest|closest|around|within|close to|per postcode|per suburb|by postcode|by suburb|each postcode|each suburb)\b", re.I)
+_RADIUS_RE = re.compile(r"\bwithin\s+(\d+(?:\.\d+)?)\s*(km|kms|kilometers|kilometres|m|meters|metres)\b", re.I)
+_NEAREST_RE = re.compile(r"\b(?:nearest|closest)(?:\s+(\d+))?\b", re.I)
+_COORDINATES_RE = re.compile(r"(-?\d{1,2}\.\d+)\s*,\s*(-?\d{1,3}\.\d+)")
+_SUMMARY_RE = re.compile(r"\b(?:per|by|each|every)\s+(postcode|suburb)\b", re.I)
+# Lookahead, so every "near X" / "in X" phrase is found even when one contains another
+# ("in each suburb around Bondi" also yields "Bondi")
+_PLACE_RE = re.compile(r"(?=\b(?:near|around|of|to|in)\s+([A-Za-z][\w '-]*?)\s*(?:[?.!,]|$))", re.I)
+
+
+# Function to find the place a question is about. Returns (location, named): location is (lat, lon, label)
+# or None, and `named` tells whether the question names a place at all (resolved or not).
+def _find_location(question, engine, entity_index):
+    match = _COORDINATES_RE.search(question)
+    if match:
+        lat, lon = float(match.group(1)), float(match.group(2))
+        return (lat, lon, f"({lat:.4f}, {lon:.4f})"), True
+    if entity_index is not None:
+        matches = entity_index.resolve(question)
+        for column in ("SCHOOL_NAME", "SUBURB"):
+            for value, _ in matches.get(column, []):
+                location = engine.locate(value)
+                if location is not None:
+                    return location, True
+    # Otherwise the words after "near" / "in" / ..., longest prefix first ("Bondi Beach and show ...").
+    # "in each suburb" is the grouping, not a place.
+    places = _PLACE_RE.findall(_SUMMARY_RE.sub(" ", question))
+    for place in places:
+        words = place.split()
+        for end in range(len(words), 0, -1):
+            location = engine.locate(" ".join(words[:end]))
+            if location is not None:
+                return location, True
+    return None, bool(places)
+
+
+# Function to answer a "schools near X" / "schools per postcode" question locally.
+# Returns (text, frame) or None when the question is not a geo question the engine can answer, in which
+# case the chatbot falls back to generating SQL. `get_engine` is only called for geo questions.
+def answer_geo_question(question, get_engine=get_geo_engine, entity_index=None):
+    if not _GEO_INTENT_RE.search(question):
+        return None
+    started = time.perf_counter()
+    engine = get_engine()
+    location, named = _find_location(question, engine, entity_index)
+    # A place the index does not know is left to the model rather than silently dropped
+    if location is None and named:
+        return None
+    summary = _SUMMARY_RE.search(question)
+    radius = _RADIUS_RE.search(question)
+    km = None
+    if radius:
+        km = float(radius.group(1)) / (1000 if radius.group(2).lower().startswith("m") else 1)
+
+    if summary:
+        by = summary.group(1).upper()
+        rows = engine.within_radius(location[0], location[1], km or GEO_DEFAULT_RADIUS_KM) if location else None
+        frame = engine.region_summary(by, rows).head(20)
+        scope = f" within {km or GEO_DEFAULT_RADIUS_KM:g} km of {location[2]}" if location else ""
+        text = f"Schools per {by.lower()}{scope} (top {len(frame)} by number of schools)"
+    elif location is None:
+        return None
+    elif km is None and _NEAREST_RE.search(question):
+        neighbours = _NEAREST_RE.search(question).group(1)
+        k = int(neighbours) if neighbours else GEO_DEFAULT_NEIGHBOURS
+        frame = engine.nearest(location[0], location[1], k)
+        text = f"The {len(frame)} schools nearest to {location[2]}"
+    else:
+        km = km or GEO_DEFAULT_RADIUS_KM
+        frame = engine.within_radius(location[0], location[1], km)
+        text = f"{len(frame)} schools within {km:g} km of {location[2]}"
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    return f"{text}, answered from the local geo index in {elapsed_ms:.1f} ms.", frame
+
+
+# Function to render the schools explorer: radius / nearest / bounding-box queries and region summaries
+def render_geo_explorer(engine):
+    st.subheader("Australian Schools Explorer")
+    mode = st.radio("Query", ["Within a radius", "Nearest schools", "Bounding box", "Schools per postcode / suburb"],
+                    horizontal=True)
+
+    suburbs = engine.region_summary("SUBURB")
+    places = ["Sydney CBD"] + [f"{s} ({state})" for s, state in suburbs[["SUBURB", "STATE"]].itertuples(index=False)]
+    place = st.selectbox("Centre on", places)
+    if place == "Sydney CBD":
+        centre_lat, centre_lon = -33.8688, 151.2093
+    else:
+        row = suburbs.iloc[places.index(place) - 1]
+        centre_lat, centre_lon = float(row["LATITUDE"]), float(row["LONGITUDE"])
+    col1, col2 = st.columns(2)
+    lat = col1.number_input("Latitude", value=centre_lat, format="%.5f")
+    lon = col2.number_input("Longitude", value=centre_lon, format="%.5f")
+
+    started = time.perf_counter()
+    if mode == "Within a radius":
+        km = st.slider("Radius (km)", 1, 100, int(GEO_DEFAULT_RADIUS_KM))
+        result = engine.within_radius(lat, lon, km)
+    elif mode == "Nearest schools":
+        k = st.slider("Number of schools", 1, 100, GEO_DEFAULT_NEIGHBOURS)
+        result = engine.nearest(lat, lon, k)
+    elif mode == "Bounding box":
+        half = st.slider("Half-width (degrees)", 0.05, 5.0, 0.25)
+        result = engine.in_bbox(lat - half, lon - half, lat + half, lon + half)
+    else:
+        by = st.selectbox("Group by", ["POSTCODE", "SUBURB"])
+        km = st.slider("Within (km, 0 = whole country)", 0, 200, 0)
+        result = engine.region_summary(by, engine.within_radius(lat, lon, km) if km else None)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    st.caption(f"{len(result)} rows in {elapsed_ms:.1f} ms")
+    show_geo_result(result)
+
+
+# Function to show a geo result as a table plus a map of the rows that have coordinates
+def show_geo_result(result):
+    st.dataframe(result)
+    points = result[["LATITUDE", "LONGITUDE"]].apply(pd.to_numeric, errors="coerce").dropna()
+    if len(points):
+        st.map(points, latitude="LATITUDE", longitude="LONGITUDE")
@@ -0,0 +1,225 @@
+# Cached, columnar dataset loader for the Snowflake tables used by the app
+import hashlib
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+
+from caching import LRUCache, atomic_write
+from executor import backend_of, get_executor
+from schema import memory_footprint
+from tracing import span
+
+# Where the local Parquet snapshots live and how long an in-process copy is trusted
+SNAPSHOT_DIR = st.secrets.get("SNAPSHOT_DIR", ".eduregion_cache")
+CACHE_TTL_SECONDS = int(st.secrets.get("CACHE_TTL_SECONDS", 300))
+CACHE_MAX_ENTRIES = int(st.secrets.get("CACHE_MAX_ENTRIES", 8))
+
+# In-process cache shared by every session of this server process:
+# key -> (frame, version, loaded_at)
+_frame_cache = LRUCache(CACHE_MAX_ENTRIES)
+
+
+def _snapshot_key(table_name, columns):
+    column_part = ",".join(sorted(c.upper() for c in columns)) if columns else "*"
+    digest = hashlib.sha1(f"{table_name.upper()}|{column_part}".encode()).hexdigest()[:12]
+    return f"{table_name.replace('.', '_').lower()}__{digest}"
+
+
+def _snapshot_paths(key):
+    base = os.path.join(SNAPSHOT_DIR, key)
+    return f"{base}.parquet", f"{base}.json"
+
+
+def _select_list(columns):
+    return ", ".join(columns) if columns else "*"
+
+
+# Function to fetch the cheap version marker of a table (row count + last DDL/DML time).
+# Returns None when it cannot be looked up (e.g. no privilege on INFORMATION_SCHEMA); the table is then
+# loaded unversioned instead of failing the page.
+def fetch_table_version(conn, table_name):
+    try:
+        result = conn.query(backend_of(conn).version_sql(table_name), ttl=0, show_spinner=False)
+    except Exception:
+        return None
+    if result is None or len(result) == 0:
+        return None
+    row = result.iloc[0]
+    return {"row_count": int(row["ROW_COUNT"]), "last_altered": str(row["LAST_ALTERED"])}
+
+
+def version_token(version):
+    if not version:
+        return "unversioned"
+    return f"{version['row_count']}@{version['last_altered']}"
+
+
+def _read_snapshot(key):
+    data_path, meta_path = _snapshot_paths(key)
+    if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+        return None, None
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        data = pd.read_parquet(data_path)
+        data.attrs.update(meta.get("attrs", {}))
+        return data, meta
+    except (OSError, ValueError):
+        # A half-written or corrupt snapshot is simply treated as missing
+        return None, None
+
+
+def _write_snapshot(key, data, version):
+    data_path, meta_path = _snapshot_paths(key)
+    atomic_write(data_path, lambda f: data.to_parquet(f, index=False), mode="wb")
+    atomic_write(meta_path, lambda f: json.dump(
+        {"version": version, "written_at": time.time(), "attrs": data.attrs}, f, default=str))
+
+
+# Function to pull only the rows appended since the snapshot was taken.
+# Needs CHANGE_TRACKING on the source table; returns None whenever the change is anything other than
+# pure inserts (an UPDATE or same-size MERGE moves LAST_ALTERED without adding rows), so the caller
+# falls back to a full reload.
+def _fetch_appended_rows(conn, table_name, columns, old_version, new_version):
+    added = new_version["row_count"] - old_version["row_count"]
+    if added <= 0:
+        return None
+    # SELECT * already includes the METADATA$ columns of a CHANGES query
+    select_list = f"{_select_list(columns)}, METADATA$ACTION, METADATA$ISUPDATE" if columns else "*"
+    try:
+        changes = conn.query(f"""
+            SELECT {select_list} FROM {table_name}
+            CHANGES(INFORMATION => DEFAULT)
+            AT(TIMESTAMP => '{old_version['last_altered']}'::TIMESTAMP_LTZ)
+            """, ttl=0, show_spinner=False,
+        )
+    except Exception:
+        return None
+    if not {"METADATA$ACTION", "METADATA$ISUPDATE"} <= set(changes.columns):
+        return None
+    # Any delete or update in the window means the snapshot's existing rows are stale too
+    inserts_only = (changes["METADATA$ACTION"] == "INSERT").all() and not changes["METADATA$ISUPDATE"].astype(bool).any()
+    # Only trust the delta if it accounts for every new row
+    if not inserts_only or len(changes) != added:
+        return None
+    return changes.drop(columns=[c for c in changes.columns if c.startswith("METADATA$")])
+
+
+def _remember(key, data, version):
+    _frame_cache.put(key, (data, version, time.monotonic()))
+
+
+def _cached(key):
+    return _frame_cache.get(key)
+
+
+# Function to load a table through the memory cache -> Parquet snapshot -> warehouse chain.
+# `transform` (e.g. schema.normalize_frame) runs once per load, before the frame is cached and
+# persisted, so every session shares the same compact frame. Callers must treat it as read-only.
+def load_table(table_name, columns=None, conn=None, transform=None):
+    with span("loader.load_table", table=table_name) as attributes:
+        data, attributes["source"] = _load_table(table_name, columns, conn, transform)
+        attributes["rows"] = len(data)
+        return data
+
+
+def _load_table(table_name, columns, conn, transform):
+    key = _snapshot_key(table_name, columns)
+
+    # 1. Fresh in-process copy: no warehouse round trip at all
+    entry = _cached(key)
+    if entry is not None and time.monotonic() - entry[2] < CACHE_TTL_SECONDS:
+        return entry[0], "memory"
+
+    conn = conn or get_executor()
+    current_version = fetch_table_version(conn, table_name)
+
+    # 2. Stale in-process copy whose source has not moved on: just renew it
+    if entry is not None and current_version is not None and entry[1] == current_version:
+        _remember(key, entry[0], current_version)
+        return entry[0], "memory (revalidated)"
+
+    # 3. On-disk snapshot, either still current or topped up with appended rows
+    data, meta = _read_snapshot(key)
+    snapshot_changed = False
+    source = "snapshot"
+    if data is not None and current_version is not None:
+        snapshot_version = meta.get("version")
+        if not snapshot_version:
+            data = None
+        elif snapshot_version != current_version:
+            appended = _fetch_appended_rows(conn, table_name, columns, snapshot_version, current_version)
+            if appended is None:
+                data = None
+            else:
+                # The transform measures "before" as the snapshot's raw size plus the raw appended
+                # rows, not as the already-compacted snapshot
+                attrs = {k: v for k, v in data.attrs.items() if k != "memory_report"}
+                before = data.attrs.get("memory_report", {}).get("before_bytes")
+                if before and transform is not None:
+                    attrs["memory_report"] = {"before_bytes": before + memory_footprint(appended)}
+                data = pd.concat([data, appended[data.columns]], ignore_index=True)
+                data.attrs = attrs
+                snapshot_changed = True
+                source = f"snapshot + {len(appended)} appended rows"
+    else:
+        data = None
+
+    # 4. Nothing usable locally: full (column-pruned) load
+    if data is None:
+        data = conn.query(f"SELECT {_select_list(columns)} FROM {table_name}", ttl=0)
+        snapshot_changed = True
+        source = "warehouse"
+
+    if transform is not None:
+        data = transform(data)
+    data.attrs["dataset_version"] = version_token(current_version)
+    if snapshot_changed and current_version is not None:
+        _write_snapshot(key, data, current_version)
+    _remember(key, data, current_version)
+    return data, source
+
+
+# Version tokens looked up recently: table -> (token, looked_up_at)
+_version_cache = {}
+_version_lock = threading.Lock()
+
+
+# Function to get the current version token of a table, re-checking the warehouse at most once per TTL
+def current_version_token(table_name, conn=None):
+    with _version_lock:
+        entry = _version_cache.get(table_name)
+    if entry is not None and time.monotonic() - entry[1] < CACHE_TTL_SECONDS:
+        return entry[0]
+    token = version_token(fetch_table_version(conn or get_executor(), table_name))
+    with _version_lock:
+        _version_cache[table_name] = (token, time.monotonic())
+    return token
+
+
+# Function to drop cached copies so the next load goes back to the warehouse
+def invalidate(table_name=None):
+    with _version_lock:
+        if table_name is None:
+            _version_cache.clear()
+        else:
+            _version_cache.pop(table_name, None)
+    if table_name is None:
+        _frame_cache.clear()
+        return
+    prefix = table_name.replace(".", "_").lower() + "__"
+    for key in [k for k in _frame_cache.keys() if k.startswith(prefix)]:
+        _frame_cache.pop(key)
+
+
+# Function to identify the version of a loaded frame (used as a cache key by the analysis layers)
+def dataset_version(data):
+    token = data.attrs.get("dataset_version")
+    if token and token != "unversioned":
+        return token
+    # Frames that did not come through load_table get a content hash instead
+    return hashlib.sha1(pd.util.hash_pandas_object(data, index=False).values.tobytes()).hexdigest()[:16]
@@ -0,0 +1,270 @@
+# Enrollment prediction model service.
+# The linear model is fitted once per dataset version from OLS sufficient statistics (X'X, X'y, y'y),
+# persisted with its state encoder and metrics, and updated in place when rows are appended.
+# Richer regressors can be compared with k-fold cross-validation run in a process pool; the comparison
+# is cached per dataset version the same way.
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from caching import atomic_write
+from loader import SNAPSHOT_DIR, dataset_version
+from tracing import span
+
+MODEL_DIR = os.path.join(SNAPSHOT_DIR, "models")
+MODEL_INDEX = os.path.join(MODEL_DIR, "index.json")
+CV_FOLDS = int(st.secrets.get("CV_FOLDS", 5))
+CV_WORKERS = int(st.secrets.get("CV_WORKERS", os.cpu_count() or 1))
+
+FEATURES = ['State_Code', 'TOTAL_MALE_ENROLLMENT', 'TOTAL_FEMALE_ENROLLMENT']
+TARGET = 'TOTAL_ENROLLMENT'
+# Share of rows held out for evaluation (as test_size=0.3 before); the split is decided per row from
+# its content hash, so appended rows never reshuffle the rows already seen
+TEST_SHARE = 0.3
+
+_models = {}
+_comparisons = {}
+_lock = threading.Lock()
+
+
+def _row_hashes(data):
+    return pd.util.hash_pandas_object(data, index=False).to_numpy()
+
+
+def _prefix_hash(hashes):
+    # Order-independent digest of a set of rows (sum of row hashes, wrapping at 64 bits)
+    return str(int(hashes.sum(dtype=np.uint64)))
+
+
+# State encoder: known states keep their code, new states get the next free code
+def _extend_encoder(encoder, states):
+    encoder = dict(encoder)
+    for state in sorted(set(states.dropna().astype(str)) - set(encoder)):
+        encoder[state] = len(encoder)
+    return encoder
+
+
+def _design(data, encoder):
+    codes = data['UNIVERSITY_STATE'].astype(str).map(encoder).fillna(-1).to_numpy(dtype=float)
+    X = np.column_stack([
+        np.ones(len(data)), codes,
+        data['TOTAL_MALE_ENROLLMENT'].to_numpy(dtype=float),
+        data['TOTAL_FEMALE_ENROLLMENT'].to_numpy(dtype=float),
+    ])
+    return X, data[TARGET].to_numpy(dtype=float)
+
+
+def _empty_stats(k=len(FEATURES) + 1):
+    return {"xtx": np.zeros((k, k)), "xty": np.zeros(k), "yty": 0.0, "ysum": 0.0, "n": 0}
+
+
+def _accumulate(stats, X, y):
+    stats["xtx"] += X.T @ X
+    stats["xty"] += X.T @ y
+    stats["yty"] += float(y @ y)
+    stats["ysum"] += float(y.sum())
+    stats["n"] += len(y)
+
+
+# Function to update the train/test sufficient statistics with a block of rows
+def _update(record, rows):
+    valid = rows[FEATURES[1:] + [TARGET, 'UNIVERSITY_STATE']].notna().all(axis=1)
+    rows = rows[valid.to_numpy()]
+    record["encoder"] = _extend_encoder(record["encoder"], rows['UNIVERSITY_STATE'])
+    hashes = _row_hashes(rows)
+    is_test = (hashes % 1000) < TEST_SHARE * 1000
+    X, y = _design(rows, record["encoder"])
+    _accumulate(record["train"], X[~is_test], y[~is_test])
+    _accumulate(record["test"], X[is_test], y[is_test])
+
+
+def _solve(record):
+    from sklearn.linear_model import LinearRegression
+
+    train, test = record["train"], record["test"]
+    beta = np.linalg.lstsq(train["xtx"], train["xty"], rcond=None)[0]
+
+    # A regular LinearRegression object, so callers keep the sklearn predict() API
+    model = LinearRegression()
+    model.intercept_ = beta[0]
+    model.coef_ = beta[1:]
+    model.n_features_in_ = len(FEATURES)
+    model.feature_names_in_ = np.array(FEATURES, dtype=object)
+
+    # Test-set error from the test statistics: SSE = y'y - 2b'X'y + b'X'Xb
+    n = test["n"]
+    sse = test["yty"] - 2 * beta @ test["xty"] + beta @ test["xtx"] @ beta
+    sst = test["yty"] - test["ysum"] ** 2 / n if n else 0.0
+    sse = max(sse, 0.0)  # guards against tiny negative rounding errors
+    mse = sse / n if n else float("nan")
+    r2 = 1 - sse / sst if sst else float("nan")
+    record["model"] = model
+    record["metrics"] = {"mse": float(mse), "r2": float(r2), "n_train": train["n"], "n_test": n}
+
+
+def _read_index():
+    try:
+        with open(MODEL_INDEX) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def _save(record):
+    import joblib
+
+    path = os.path.join(MODEL_DIR, f"{record['data_hash']}.joblib")
+    atomic_write(path, lambda f: joblib.dump(record, f), mode="wb")
+    index = [e for e in _read_index() if e["data_hash"] != record["data_hash"]]
+    index.append({"data_hash": record["data_hash"], "n_rows": record["n_rows"],
+                  "prefix_hash": record["prefix_hash"], "path": path, "saved_at": time.time()})
+    atomic_write(MODEL_INDEX, lambda f: json.dump(index[-20:], f))
+
+
+def _load(path):
+    import joblib
+
+    try:
+        return joblib.load(path)
+    except (OSError, ValueError, EOFError):
+        return None
+
+
+# Function to get the fitted model for this data: memory -> disk -> incremental update of a model
+# fitted on a prefix of these rows -> full fit. Returns the registry record.
+def get_model(data):
+    data_hash = hashlib.sha1(dataset_version(data).encode()).hexdigest()[:16]
+    with _lock:
+        record = _models.get(data_hash)
+    if record is not None:
+        return record
+
+    index = _read_index()
+    entry = next((e for e in index if e["data_hash"] == data_hash), None)
+    record = _load(entry["path"]) if entry else None
+
+    if record is None:
+        with span("model.fit", rows=len(data)) as attributes:
+            record = _fit(data, data_hash, index)
+            attributes["fit_mode"] = record["fit_mode"]
+
+    with _lock:
+        _models[data_hash] = record
+    return record
+
+
+def _fit(data, data_hash, index):
+    hashes = _row_hashes(data)
+    started = time.perf_counter()
+    record = None
+    # Appended rows: start from the newest model whose rows are exactly a prefix of this data
+    for candidate in sorted(index, key=lambda e: e["n_rows"], reverse=True):
+        if candidate["n_rows"] < len(data) and candidate["prefix_hash"] == _prefix_hash(hashes[:candidate["n_rows"]]):
+            base = _load(candidate["path"])
+            if base is not None:
+                record = dict(base, data_hash=data_hash)
+                _update(record, data.iloc[candidate["n_rows"]:])
+                record["fit_mode"] = f"incremental (+{len(data) - candidate['n_rows']} rows)"
+                break
+    if record is None:
+        record = {"data_hash": data_hash, "encoder": {}, "train": _empty_stats(), "test": _empty_stats()}
+        _update(record, data)
+        record["fit_mode"] = "full"
+    _solve(record)
+    record["fit_seconds"] = time.perf_counter() - started
+    record["n_rows"] = len(data)
+    record["prefix_hash"] = _prefix_hash(hashes)
+    _save(record)
+    return record
+
+
+# Function to predict TOTAL_ENROLLMENT for new rows with the cached model
+def predict(data, rows):
+    record = get_model(data)
+    X, _ = _design(rows.assign(**{TARGET: 0}), record["encoder"])
+    return record["model"].predict(pd.DataFrame(X[:, 1:], columns=FEATURES))
+
+
+# Regressors offered for comparison; constructed inside the worker processes
+def _make_regressor(name):
+    from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+    from sklearn.linear_model import LinearRegression, Ridge
+
+    return {
+        "LinearRegression": lambda: LinearRegression(),
+        "Ridge": lambda: Ridge(alpha=1.0),
+        "RandomForestRegressor": lambda: RandomForestRegressor(n_estimators=100, n_jobs=1, random_state=42),
+        "HistGradientBoostingRegressor": lambda: HistGradientBoostingRegressor(random_state=42),
+    }[name]()
+
+
+REGRESSORS = ["LinearRegression", "Ridge", "RandomForestRegressor", "HistGradientBoostingRegressor"]
+
+
+def _fit_fold(name, X, y, train_idx, test_idx):
+    from sklearn.metrics import mean_squared_error, r2_score
+
+    started = time.perf_counter()
+    model = _make_regressor(name)
+    model.fit(X[train_idx], y[train_idx])
+    y_pred = model.predict(X[test_idx])
+    return name, mean_squared_error(y[test_idx], y_pred), r2_score(y[test_idx], y_pred), time.perf_counter() - started
+
+
+# Function to compare regressors with k-fold CV; every (regressor, fold) pair runs in its own process.
+# Returns (summary, wall-clock seconds of the run that produced it): memory -> disk -> cross-validation.
+def compare_models(data, regressors=REGRESSORS, folds=CV_FOLDS, workers=CV_WORKERS):
+    data_hash = hashlib.sha1(dataset_version(data).encode()).hexdigest()[:16]
+    setup = hashlib.sha1(json.dumps([list(regressors), folds]).encode()).hexdigest()[:8]
+    key = (data_hash, setup)
+    with _lock:
+        comparison = _comparisons.get(key)
+    if comparison is None:
+        path = os.path.join(MODEL_DIR, f"{data_hash}__cv_{setup}.joblib")
+        comparison = _load(path) if os.path.exists(path) else None
+        if comparison is None:
+            with span("model.compare", rows=len(data), folds=folds):
+                comparison = _cross_validate(data, regressors, folds, workers)
+            _save_comparison(path, comparison)
+        with _lock:
+            _comparisons[key] = comparison
+    return comparison["summary"], comparison["wall_clock"]
+
+
+def _save_comparison(path, comparison):
+    import joblib
+
+    atomic_write(path, lambda f: joblib.dump(comparison, f), mode="wb")
+
+
+def _cross_validate(data, regressors, folds, workers):
+    from sklearn.model_selection import KFold
+
+    record = get_model(data)
+    clean = data.dropna(subset=FEATURES[1:] + [TARGET, 'UNIVERSITY_STATE'])
+    X, y = _design(clean, record["encoder"])
+    X = X[:, 1:]
+    splits = list(KFold(n_splits=folds, shuffle=True, random_state=42).split(X))
+
+    started = time.perf_counter()
+    # Workers are spawned, not forked: forking the threaded Streamlit server (exporter, spill and pool
+    # threads) can leave a child holding a lock that no thread will ever release
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(_fit_fold, name, X, y, train_idx, test_idx)
+                   for name in regressors for train_idx, test_idx in splits]
+        results = [f.result() for f in futures]
+    wall_clock = time.perf_counter() - started
+
+    scores = pd.DataFrame(results, columns=["Model", "MSE", "R2", "Fit seconds"])
+    summary = scores.groupby("Model", sort=False).agg(
+        MSE=("MSE", "mean"), R2=("R2", "mean"), R2_std=("R2", "std"), fit_seconds=("Fit seconds", "sum"),
+    ).sort_values("R2", ascending=False)
+    return {"summary": summary, "wall_clock": wall_clock}
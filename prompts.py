@@ -1,12 +1,14 @@
 import streamlit as st
+from executor import get_executor
+from context_store import get_context, refresh_record
+from entity_index import build_index
+from tables import QUALIFIED_TABLE_NAME_1, QUALIFIED_TABLE_NAME_2, SCHEMA_PATH_1, SCHEMA_PATH_2
 
-# Two schema paths for two different databases and tables
-SCHEMA_PATH_1 = st.secrets.get("SCHEMA_PATH_1", "HACKATHONS.EDUCATION_ANALYSIS")
-SCHEMA_PATH_2 = st.secrets.get("SCHEMA_PATH_2", "EDUCATION__LOCATIONS__INSIGHTS__AUSTRALIA.EDUCATION_AUS_FREE")
-
-# Table names
-QUALIFIED_TABLE_NAME_1 = f"{SCHEMA_PATH_1}.EDUCATIONAL_ENTITY_ENROLLMENT_SUMMARY"
-QUALIFIED_TABLE_NAME_2 = f"{SCHEMA_PATH_2}.ACARA_AUSTRALIAN_SCHOOLS_LIST"
+# Table behind each dataset choice offered in the chatbot
+DATASET_TABLES = {
+    'Regional University Enrollment Data': QUALIFIED_TABLE_NAME_1,
+    'Australian Educational Institutions Insights': QUALIFIED_TABLE_NAME_2,
+}
 
 # Table descriptions
 TABLE_DESCRIPTION_1 = """
@@ -36,7 +38,7 @@ Here are 6 critical rules for the interaction you must abide:
 (select 1) union (select 2)
 ```
 2. If I don't tell you to find a limited set of results in the sql query or question, you MUST limit the number of responses to 10.
-3. Text / string where clauses must be fuzzy match e.g ilike %keyword%
+3. Text / string where clauses must be fuzzy match e.g ilike %keyword%, except for values listed in an <entities> tag: filter those with = or IN using the exact values given
 4. Make sure to generate a single snowflake sql code, not multiple. 
 5. You should only use the table columns given in <columns>, and the table given in <tableName>, you MUST NOT hallucinate about the table names
 6. DO NOT put numerical at the very front of sql variable.
@@ -54,25 +56,16 @@ Now to get started, please briefly introduce yourself, describe the table at a h
 Then provide 3 example questions using bullet points.
 """
 
-@st.cache_data(show_spinner="Loading EduRegion Explorer's context...")
-def get_table_context(table_name: str, table_description: str, metadata_query: str = None):
+# Function to render the table context from the column list and metadata rows
+def render_table_context(table_name: str, table_description: str, columns: list, metadata: list = None):
     table = table_name.split(".")
-    conn = st.connection("snowflake")
 
-    # Query to get columns information
-    columns_query_result = conn.query(f"""
-        SELECT COLUMN_NAME, DATA_TYPE FROM {table[0].upper()}.INFORMATION_SCHEMA.COLUMNS
-        WHERE TABLE_SCHEMA = '{table[1].upper()}' AND TABLE_NAME = '{table[2].upper()}'
-        """, show_spinner=False,
-    )
-    
     # Processing columns data
     columns_info = ""
-    if isinstance(columns_query_result, list):
-        for row in columns_query_result:
-            column_name = row.get('COLUMN_NAME', 'N/A')
-            data_type = row.get('DATA_TYPE', 'N/A')
-            columns_info += f"- **{column_name}**: {data_type}\n"
+    for row in columns:
+        column_name = row.get('COLUMN_NAME', 'N/A')
+        data_type = row.get('DATA_TYPE', 'N/A')
+        columns_info += f"- **{column_name}**: {data_type}\n"
 
     context = f"""
 Here is the table name <tableName> {'.'.join(table)} </tableName>
@@ -85,19 +78,40 @@ Here are the columns of the {'.'.join(table)}
     """
 
     # Handling metadata query
-    if metadata_query:
-        metadata_query_result = conn.query(metadata_query, show_spinner=False)
+    if metadata is not None:
         metadata_info = ""
-
-        if isinstance(metadata_query_result, list):
-            for row in metadata_query_result:
-                for key, value in row.items():
-                    metadata_info += f"- **{key}**: {value}\n"
+        for row in metadata:
+            for key, value in row.items():
+                metadata_info += f"- **{key}**: {value}\n"
 
         context += f"\n\nAvailable metrics by COLUMN_NAME:\n\n{metadata_info}"
 
     return context
 
+def get_table_context(table_name: str, table_description: str, metadata_query: str = None):
+    # Served from the persistent context store; Snowflake is only queried when this worker has no
+    # stored context yet, and stale entries are revalidated in the background
+    def render(columns, metadata):
+        return render_table_context(table_name, table_description, columns, metadata if metadata_query else None)
+
+    with st.spinner("Loading EduRegion Explorer's context..."):
+        return get_context(table_name, table_description, metadata_query, render)
+
+# Function to build the stored context for every dataset ahead of time (`python warm_context.py`)
+def warm_context_store():
+    conn = get_executor()
+    for table_name, table_description, metadata_query in [
+        (QUALIFIED_TABLE_NAME_1, TABLE_DESCRIPTION_1, METADATA_QUERY_1),
+        (QUALIFIED_TABLE_NAME_2, TABLE_DESCRIPTION_2, METADATA_QUERY_2),
+    ]:
+        def render(columns, metadata, table_name=table_name, table_description=table_description):
+            return render_table_context(table_name, table_description, columns, metadata)
+
+        record = refresh_record(conn, table_name, table_description, metadata_query, render)
+        print(f"{table_name}: schema {record['fingerprint']}, version {record['version']}")
+        index = build_index(table_name, conn)
+        print(f"{table_name}: {sum(len(c.values) for c in index.columns.values())} entity names indexed")
+
 def get_system_prompt(dataset_choice):
     if dataset_choice == 'Regional University Enrollment Data':
         # For dataset_1, explicitly list the column names
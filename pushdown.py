@@ -0,0 +1,189 @@
+# Analysis engines behind perform_eda / create_visualizations / interactive_data_filter.
+# "warehouse" pushes the filters and aggregations down to Snowflake as parameterized
+# GROUP BY / WHERE SQL so only small result sets travel; "pandas" slices the in-memory rollup cube.
+# The warehouse only holds the raw table, so frames that went through Clean Data (deduplicated,
+# names merged, totals derived) are always analysed in memory.
+import pandas as pd
+import streamlit as st
+
+from executor import get_executor
+from rollup import CUBE_DIMENSIONS, CUBE_MEASURES, get_describe, get_rollup, rollup_counts, rollup_slice, rollup_total
+from tables import QUALIFIED_TABLE_NAME_1
+from tracing import span
+
+ANALYSIS_ENGINE = st.secrets.get("ANALYSIS_ENGINE", "pandas")
+ENROLLMENT_TABLE = QUALIFIED_TABLE_NAME_1
+
+# Only these identifiers may be interpolated into SQL; values always go through bind parameters
+ALLOWED_COLUMNS = set(CUBE_DIMENSIONS) | set(CUBE_MEASURES) | {"UNIVERSITY_NAME"}
+
+
+def _check_columns(*columns):
+    for column in columns:
+        if column not in ALLOWED_COLUMNS:
+            raise ValueError(f"Column {column!r} cannot be used in a pushed-down query")
+
+
+def _where_clause(where):
+    if not where:
+        return "", {}
+    _check_columns(*where)
+    conditions = [f"{column} = %({column.lower()})s" for column in where]
+    params = {column.lower(): value for column, value in where.items()}
+    return "WHERE " + " AND ".join(conditions), params
+
+
+# Query builders: each returns (sql, params) for SnowflakeConnection.query(sql, params=params)
+def build_group_sum_query(table_name, by, measures, where=None):
+    _check_columns(by, *measures)
+    where_sql, params = _where_clause(where)
+    sums = ", ".join(f"SUM({m}) AS {m}" for m in measures)
+    sql = f"SELECT {by}, {sums} FROM {table_name} {where_sql} GROUP BY {by} ORDER BY {by}"
+    return sql, params
+
+
+def build_count_query(table_name, by, where=None):
+    _check_columns(by)
+    where_sql, params = _where_clause(where)
+    sql = f"SELECT {by}, COUNT(*) AS N_ROWS FROM {table_name} {where_sql} GROUP BY {by} ORDER BY N_ROWS DESC"
+    return sql, params
+
+
+def build_total_query(table_name, measures, where=None):
+    _check_columns(*measures)
+    where_sql, params = _where_clause(where)
+    sums = ", ".join(f"SUM({m}) AS {m}" for m in measures)
+    return f"SELECT {sums} FROM {table_name} {where_sql}", params
+
+
+def build_distinct_query(table_name, column):
+    _check_columns(column)
+    return f"SELECT DISTINCT {column} FROM {table_name} WHERE {column} IS NOT NULL ORDER BY {column}", {}
+
+
+def build_rows_query(table_name, where=None):
+    where_sql, params = _where_clause(where)
+    return f"SELECT * FROM {table_name} {where_sql}", params
+
+
+def build_describe_query(table_name, measures):
+    _check_columns(*measures)
+    parts = []
+    for m in measures:
+        parts += [
+            f"COUNT({m}) AS {m}__COUNT", f"AVG({m}) AS {m}__MEAN", f"STDDEV({m}) AS {m}__STD",
+            f"MIN({m}) AS {m}__MIN", f"APPROX_PERCENTILE({m}, 0.25) AS {m}__P25",
+            f"APPROX_PERCENTILE({m}, 0.5) AS {m}__P50", f"APPROX_PERCENTILE({m}, 0.75) AS {m}__P75",
+            f"MAX({m}) AS {m}__MAX",
+        ]
+    return f"SELECT {', '.join(parts)} FROM {table_name}", {}
+
+
+DESCRIBE_STATS = [("COUNT", "count"), ("MEAN", "mean"), ("STD", "std"), ("MIN", "min"),
+                  ("P25", "25%"), ("P50", "50%"), ("P75", "75%"), ("MAX", "max")]
+
+
+# In-memory engine: every answer is a slice of the rollup cube of the loaded frame
+class PandasEngine:
+    name = "pandas"
+
+    def __init__(self, data):
+        self.data = data
+
+    def describe(self):
+        return get_describe(self.data)
+
+    def group_sum(self, by, measures, where=None):
+        return rollup_slice(get_rollup(self.data), by, measures, where=where)
+
+    def counts(self, by):
+        return rollup_counts(get_rollup(self.data), by)
+
+    def totals(self, measures):
+        cube = get_rollup(self.data)
+        return {m: rollup_total(cube, m) for m in measures}
+
+    def distinct(self, column):
+        return list(get_rollup(self.data)[column].dropna().unique())
+
+    def rows(self, where):
+        mask = pd.Series(True, index=self.data.index)
+        for column, value in where.items():
+            mask &= self.data[column] == value
+        return self.data[mask]
+
+
+# Warehouse engine: runs the built SQL in Snowflake, falling back to pandas if a query fails
+# (the fallback is recorded on the span and shown under the result)
+class WarehouseEngine:
+    name = "warehouse"
+
+    def __init__(self, table_name=ENROLLMENT_TABLE, conn=None, fallback=None):
+        self.table_name = table_name
+        self.conn = conn
+        self.fallback = fallback
+
+    def _query(self, sql, params, fallback_call):
+        with span("pushdown.query", engine=self.name) as attributes:
+            try:
+                conn = self.conn or get_executor()
+                return conn.query(sql, params=params or None, show_spinner=False)
+            except Exception as e:
+                if fallback_call is None or self.fallback is None:
+                    raise
+                error = type(e).__name__
+                attributes.update(fallback=self.fallback.name, fallback_error=error)
+            st.caption(f"The Snowflake query failed ({error}); showing the result computed in memory instead.")
+            return fallback_call(self.fallback)
+
+    def describe(self):
+        sql, params = build_describe_query(self.table_name, CUBE_MEASURES)
+        result = self._query(sql, params, lambda engine: engine.describe())
+        if "count" in result.index:
+            return result
+        row = result.iloc[0]
+        return pd.DataFrame(
+            {m: [row[f"{m}__{suffix}"] for suffix, _ in DESCRIBE_STATS] for m in CUBE_MEASURES},
+            index=[label for _, label in DESCRIBE_STATS],
+        )
+
+    def group_sum(self, by, measures, where=None):
+        sql, params = build_group_sum_query(self.table_name, by, measures, where)
+        result = self._query(sql, params, lambda engine: engine.group_sum(by, measures, where))
+        return result.set_index(by) if by in result.columns else result
+
+    def counts(self, by):
+        sql, params = build_count_query(self.table_name, by)
+        result = self._query(sql, params, lambda engine: engine.counts(by))
+        if isinstance(result, pd.DataFrame):
+            return result.set_index(by)["N_ROWS"].rename("count")
+        return result
+
+    def totals(self, measures):
+        sql, params = build_total_query(self.table_name, measures)
+        result = self._query(sql, params, lambda engine: engine.totals(measures))
+        if isinstance(result, dict):
+            return result
+        return {m: result.iloc[0][m] for m in measures}
+
+    def distinct(self, column):
+        sql, params = build_distinct_query(self.table_name, column)
+        result = self._query(sql, params, lambda engine: engine.distinct(column))
+        return list(result[column]) if isinstance(result, pd.DataFrame) else result
+
+    def rows(self, where):
+        sql, params = build_rows_query(self.table_name, where)
+        return self._query(sql, params, lambda engine: engine.rows(where))
+
+
+# Function to pick the engine for a call: an explicit engine wins, then the ANALYSIS_ENGINE setting
+def get_engine(data, engine=None):
+    if isinstance(data, (PandasEngine, WarehouseEngine)):
+        return data
+    engine = engine or ANALYSIS_ENGINE
+    if engine == "warehouse" and data is not None and data.attrs.get("cleaned"):
+        # Pushed-down aggregates would read the raw table and silently undo the cleaning
+        engine = "pandas"
+    if engine == "warehouse":
+        return WarehouseEngine(fallback=PandasEngine(data) if data is not None else None)
+    return PandasEngine(data)
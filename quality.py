@@ -0,0 +1,223 @@
+# Data-quality profiling and cleaning of the enrollment table.
+# One vectorized pass per frame (or per chunk): enrollment figures are coerced to numbers, missing
+# totals are derived from the male/female figures, university and state names are trimmed and
+# case-normalized (per distinct value, not per row), duplicates are found from 64-bit row hashes and
+# TOTAL_ENROLLMENT is checked against MALE + FEMALE. Results are cached per dataset version; frames
+# too large for memory can be profiled chunk by chunk with profile_chunks / profile_table.
+import functools
+import re
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from caching import LRUCache
+from loader import dataset_version
+from schema import ENROLLMENT_SCHEMA, normalize_frame
+from tracing import span
+
+QUALITY_CACHE_MAX_ENTRIES = int(st.secrets.get("QUALITY_CACHE_MAX_ENTRIES", 4))
+QUALITY_CHUNK_ROWS = int(st.secrets.get("QUALITY_CHUNK_ROWS", 500000))
+
+NAME_COLUMNS = ["UNIVERSITY_NAME", "UNIVERSITY_STATE", "REGIONAL_CENTER_STATE", "REGIONAL_CENTER_DISTRICT"]
+COUNT_COLUMNS = [c for c, kind in ENROLLMENT_SCHEMA.items() if kind == "count"]
+MALE, FEMALE, TOTAL = "TOTAL_MALE_ENROLLMENT", "TOTAL_FEMALE_ENROLLMENT", "TOTAL_ENROLLMENT"
+# Rows kept in the report to show what an inconsistent total looks like
+EXAMPLE_ROWS = 5
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_report_cache = LRUCache(QUALITY_CACHE_MAX_ENTRIES)
+
+
+@functools.lru_cache(maxsize=65536)
+def _name_key(value):
+    # Spellings that only differ in case or spacing share a key
+    return _WHITESPACE_RE.sub(" ", value).strip().casefold()
+
+
+# Function to choose one spelling per name key: the most frequent one (ties: the first seen)
+def canonical_names(values, counts, canonical=None):
+    canonical = dict(canonical or {})
+    counts = np.asarray(counts)
+    order = np.argsort(-counts, kind="stable")
+    for i in order[:np.count_nonzero(counts)]:
+        value = values[i]
+        if isinstance(value, str):
+            canonical.setdefault(_name_key(value), _WHITESPACE_RE.sub(" ", value).strip())
+    return canonical
+
+
+def _distinct(column):
+    # Distinct values and their row counts, without touching the rows of a categorical twice
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        codes = column.cat.codes.to_numpy()
+        return np.asarray(column.cat.categories, dtype=object), np.bincount(codes[codes >= 0], minlength=len(column.cat.categories))
+    codes, uniques = pd.factorize(column)
+    return np.asarray(uniques, dtype=object), np.bincount(codes[codes >= 0], minlength=len(uniques))
+
+
+# Function to map a name column onto the canonical spellings; works on the distinct values only
+def _normalize_names(column, canonical):
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        codes = column.cat.codes.to_numpy()
+        categories = column.cat.categories
+    else:
+        codes, categories = pd.factorize(column)
+    mapped = [canonical.get(_name_key(v), v) if isinstance(v, str) else v for v in categories]
+    inverse, targets = pd.factorize(pd.Series(mapped, dtype=object))
+    new_codes = inverse[codes] if len(inverse) else codes.copy()
+    new_codes[codes < 0] = -1
+    merged = len(categories) - len(targets)
+    normalized = pd.Series(pd.Categorical.from_codes(new_codes, categories=targets), index=column.index, name=column.name)
+    if not isinstance(column.dtype, pd.CategoricalDtype):
+        normalized = normalized.astype(object)
+    return normalized, merged
+
+
+def _empty_report():
+    return {
+        "rows_in": 0, "rows_out": 0, "chunks": 0,
+        "missing": {}, "coerced": {}, "dtypes": {},
+        "empty_rows": 0, "imputed_totals": 0, "duplicates": 0,
+        "inconsistent_totals": 0, "inconsistent_examples": [],
+        "merged_names": {},
+    }
+
+
+def _add(counter, key, value):
+    counter[key] = counter.get(key, 0) + int(value)
+
+
+# Function to clean one frame (or chunk) and fold its findings into `state`
+def _clean_chunk(chunk, state, drop_duplicates):
+    report = state["report"]
+    report["rows_in"] += len(chunk)
+    report["chunks"] += 1
+    converted = {}
+
+    # Type coercion: enrollment figures must be non-negative numbers
+    for column in COUNT_COLUMNS:
+        if column not in chunk.columns:
+            continue
+        original = chunk[column]
+        numbers = pd.to_numeric(original, errors="coerce") if not pd.api.types.is_numeric_dtype(original) else original
+        negative = numbers < 0
+        if negative.any():
+            numbers = numbers.where(~negative)
+        _add(report["coerced"], column, numbers.isna().sum() - original.isna().sum())
+        if numbers is not original:
+            converted[column] = numbers
+
+    # Names: trimmed, case-normalized
+    for column in NAME_COLUMNS:
+        if column not in chunk.columns:
+            continue
+        values, counts = _distinct(chunk[column])
+        state["canonical"][column] = canonical_names(values, counts, state["canonical"].get(column))
+        converted[column], merged = _normalize_names(chunk[column], state["canonical"][column])
+        _add(report["merged_names"], column, merged)
+
+    cleaned = chunk.assign(**converted) if converted else chunk
+
+    # Missing values: totals are derived from the male/female figures; rows without any figure are dropped
+    if {MALE, FEMALE, TOTAL} <= set(cleaned.columns):
+        male, female, total = cleaned[MALE], cleaned[FEMALE], cleaned[TOTAL]
+        derivable = total.isna() & male.notna() & female.notna()
+        if derivable.any():
+            # Summed as float64: the compact unsigned counts would wrap around (uint16: 40000 + 30000 = 4464)
+            derived = male.astype("float64") + female.astype("float64")
+            cleaned = cleaned.assign(**{TOTAL: total.astype("float64").where(~derivable, derived)})
+            _add(report, "imputed_totals", derivable.sum())
+        empty = cleaned[[MALE, FEMALE, TOTAL]].isna().all(axis=1)
+        if empty.any():
+            cleaned = cleaned[~empty.to_numpy()]
+            _add(report, "empty_rows", empty.sum())
+
+        # Consistency: TOTAL_ENROLLMENT == MALE + FEMALE where all three are known
+        male, female, total = cleaned[MALE], cleaned[FEMALE], cleaned[TOTAL]
+        inconsistent = (total.astype(float) != male.astype(float) + female.astype(float)) & male.notna() & female.notna() & total.notna()
+        _add(report, "inconsistent_totals", inconsistent.sum())
+        room = EXAMPLE_ROWS - len(report["inconsistent_examples"])
+        if room > 0 and inconsistent.any():
+            report["inconsistent_examples"].extend(cleaned[inconsistent.to_numpy()].head(room).to_dict("records"))
+
+    for column in cleaned.columns:
+        _add(report["missing"], column, cleaned[column].isna().sum())
+        report["dtypes"][column] = str(cleaned[column].dtype)
+
+    # Duplicates: compared by 64-bit row hashes (also across chunks), never by the wide string rows
+    hashes = pd.util.hash_pandas_object(cleaned, index=False).to_numpy()
+    duplicate = pd.Series(hashes).duplicated().to_numpy()
+    if state["seen"] is not None:
+        seen = state["seen"]
+        if len(seen):
+            position = np.minimum(np.searchsorted(seen, hashes), len(seen) - 1)
+            duplicate = duplicate | (seen[position] == hashes)
+        state["seen"] = np.sort(np.concatenate([seen, hashes[~duplicate]]))
+    _add(report, "duplicates", duplicate.sum())
+    if drop_duplicates and duplicate.any():
+        cleaned = cleaned[~duplicate]
+
+    report["rows_out"] += len(cleaned)
+    return cleaned
+
+
+def _new_state(chunked):
+    # Row hashes are only remembered when later chunks have to be checked against them
+    seen = np.array([], dtype=np.uint64) if chunked else None
+    return {"report": _empty_report(), "canonical": {}, "seen": seen}
+
+
+# Function to turn the per-column counters of a report into a table for display
+def column_summary(report):
+    return pd.DataFrame({
+        "Missing Values": pd.Series(report["missing"], dtype="int64"),
+        "Coerced to missing": pd.Series(report["coerced"], dtype="int64"),
+        "Data Types": pd.Series(report["dtypes"], dtype=object),
+    }, index=list(report["missing"])).fillna({"Coerced to missing": 0}).astype({"Coerced to missing": "int64"})
+
+
+# Function to clean a frame that fits in memory. Returns (cleaned frame, report); both are cached per
+# dataset version, and the cleaned frame gets its own version so downstream caches key on it.
+def clean_frame(data, drop_duplicates=True):
+    version = dataset_version(data)
+    key = (version, drop_duplicates)
+    cached = _report_cache.get(key)
+    if cached is not None:
+        return cached
+
+    with span("quality.clean", rows=len(data)) as attributes:
+        state = _new_state(chunked=False)
+        cleaned = _clean_chunk(data, state, drop_duplicates)
+        cleaned = normalize_frame(cleaned)
+        cleaned.attrs = dict(data.attrs, memory_report=cleaned.attrs["memory_report"])
+        cleaned.attrs["dataset_version"] = f"{version}:clean"
+        cleaned.attrs["cleaned"] = True
+        report = state["report"]
+        attributes.update(duplicates=report["duplicates"], inconsistent=report["inconsistent_totals"])
+
+    _report_cache.put(key, (cleaned, report))
+    return cleaned, report
+
+
+# Function to profile data arriving in chunks (DataFrames or pyarrow batches/tables). A name keeps the
+# spelling it was first canonicalized to, and duplicates are found across chunks. When `on_chunk` is given,
+# every cleaned chunk is handed to it (e.g. to write it out) instead of being kept.
+def profile_chunks(chunks, drop_duplicates=True, on_chunk=None):
+    state = _new_state(chunked=True)
+    with span("quality.profile_chunks") as attributes:
+        for chunk in chunks:
+            if not isinstance(chunk, pd.DataFrame):
+                chunk = chunk.to_pandas()
+            cleaned = _clean_chunk(chunk, state, drop_duplicates)
+            if on_chunk is not None:
+                on_chunk(cleaned)
+        attributes.update(chunks=state["report"]["chunks"], rows=state["report"]["rows_in"])
+    return state["report"]
+
+
+# Function to profile a warehouse table without loading it: the rows are streamed in Arrow batches
+def profile_table(table_name, conn, columns=None, chunk_rows=QUALITY_CHUNK_ROWS, **kwargs):
+    sql = f"SELECT {', '.join(columns) if columns else '*'} FROM {table_name}"
+    return profile_chunks(conn.query_batches(sql, batch_rows=chunk_rows), **kwargs)
@@ -0,0 +1,173 @@
+# Response cache for chat completions.
+# Answers are reused for the same (or, optionally, a near-identical wording of the same) question asked
+# against the same dataset after the same previous turn, and replayed through the same streaming loop as a
+# live completion. An answer is only stored once its SQL has run successfully (store_response).
+import hashlib
+import math
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+
+import streamlit as st
+
+RESPONSE_CACHE_MAX_ENTRIES = int(st.secrets.get("RESPONSE_CACHE_MAX_ENTRIES", 512))
+RESPONSE_CACHE_TTL_SECONDS = int(st.secrets.get("RESPONSE_CACHE_TTL_SECONDS", 24 * 3600))
+# 1.0 means exact (normalized) matches only. Below 1.0, a stored answer is also reused for a wording
+# whose trigram similarity reaches this value, but only if it has the same content words (see
+# content_words), so names, numbers and e.g. "male"/"female" must match exactly.
+RESPONSE_CACHE_SIMILARITY = float(st.secrets.get("RESPONSE_CACHE_SIMILARITY", 1.0))
+
+# Size of the chunks a cached answer is replayed in
+REPLAY_CHUNK_CHARS = 24
+
+# Words that can differ between two wordings of the same question
+STOPWORDS = frozenset("""
+a about all an and any are as at be by can could do does for from give has have how i in is it list
+me my of on or please show tell than that the their there these this those to was were what which who
+with would you
+""".split())
+
+
+# Function to normalize a question: case-folded, punctuation dropped, whitespace collapsed
+def normalize_question(question):
+    question = re.sub(r"[^\w\s%]", " ", question.casefold())
+    return " ".join(question.split())
+
+
+# Function to get the words of a normalized question that carry its meaning: everything except
+# stopwords, so numbers, entity names and measures ("male", "female") all take part
+def content_words(text):
+    return frozenset(word for word in text.split() if word not in STOPWORDS)
+
+
+# Function to build a local bag-of-trigrams "embedding" of a normalized question
+def trigram_vector(text):
+    padded = f"  {text} "
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def cosine_similarity(a, b):
+    if not a or not b:
+        return 0.0
+    dot = sum(count * b.get(gram, 0) for gram, count in a.items())
+    norm = math.sqrt(sum(c * c for c in a.values())) * math.sqrt(sum(c * c for c in b.values()))
+    return dot / norm if norm else 0.0
+
+
+class ResponseCache:
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES, ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+                 similarity=RESPONSE_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+        # (dataset, previous-turn digest, normalized question) -> (answer, trigram vector, stored_at, content words)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _fresh(self, entry):
+        return time.monotonic() - entry[2] <= self.ttl_seconds
+
+    # `context` identifies the conversation a follow-up question depends on ("" for a first question);
+    # answers are only reused within the same context
+    def get(self, dataset, question, context=""):
+        normalized = normalize_question(question)
+        key = (dataset, context, normalized)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._fresh(entry):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+            if self.similarity < 1.0:
+                vector, words = trigram_vector(normalized), content_words(normalized)
+                best_key, best_score = None, self.similarity
+                for other_key, other in self._entries.items():
+                    # Similar spelling is not enough: "Alagappa University" and "Andhra University"
+                    # are close in trigrams but different questions
+                    if other_key[:2] != (dataset, context) or other[3] != words or not self._fresh(other):
+                        continue
+                    score = cosine_similarity(vector, other[1])
+                    if score >= best_score:
+                        best_key, best_score = other_key, score
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.hits += 1
+                    return self._entries[best_key][0]
+
+            self.misses += 1
+            return None
+
+    def put(self, dataset, question, answer, context=""):
+        normalized = normalize_question(question)
+        key = (dataset, context, normalized)
+        with self._lock:
+            entry = self._entries.get(key)
+            # Replaying a cached answer must not extend its lifetime
+            stored_at = entry[2] if entry is not None and entry[0] == answer and self._fresh(entry) else time.monotonic()
+            self._entries[key] = (answer, trigram_vector(normalized), stored_at, content_words(normalized))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def evict(self, dataset, question, context=""):
+        with self._lock:
+            self._entries.pop((dataset, context, normalize_question(question)), None)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+# One cache per server process, shared by every session
+response_cache = ResponseCache()
+
+
+# Function to split a cached answer into stream-sized pieces
+def replay_chunks(answer, chunk_chars=REPLAY_CHUNK_CHARS):
+    for start in range(0, len(answer), chunk_chars):
+        yield answer[start:start + chunk_chars]
+
+
+# Function to find the question of a turn and the context it depends on: a digest of the previous
+# user/assistant turn, or "" when the question is the first of the conversation window
+def turn_key(messages):
+    turns = [m for m in messages if m["role"] in ("user", "assistant")]
+    if not turns or turns[-1]["role"] != "user":
+        return None, ""
+    previous = turns[-3:-1]
+    if not previous:
+        return turns[-1]["content"], ""
+    digest = hashlib.sha1()
+    for m in previous:
+        digest.update(f"{m['role']}|{normalize_question(m['content'])}\n".encode())
+    return turns[-1]["content"], digest.hexdigest()[:16]
+
+
+# Function to stream the assistant's answer as text chunks: replayed from the cache on a hit,
+# otherwise streamed from `client` (any object with an OpenAI-style chat.completions.create).
+# Nothing is stored here; call store_response once the answer's SQL has run.
+def stream_response(client, messages, dataset, model="gpt-3.5-turbo", cache=response_cache):
+    question, context = turn_key(messages)
+    cached = cache.get(dataset, question, context) if question else None
+    if cached is not None:
+        yield from replay_chunks(cached)
+        return
+
+    for delta in client.chat.completions.create(model=model, messages=messages, stream=True):
+        yield delta.choices[0].delta.content or ""
+
+
+# Function to record the outcome of a turn: a successful answer is stored for reuse, a failed one
+# (its SQL errored or timed out) is evicted so it is never replayed to anyone else
+def store_response(messages, dataset, answer, succeeded, cache=response_cache):
+    question, context = turn_key(messages)
+    if not question or not answer:
+        return
+    if succeeded:
+        cache.put(dataset, question, answer, context)
+    else:
+        cache.evict(dataset, question, context)
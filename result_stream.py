@@ -0,0 +1,194 @@
+# Streaming result mode for the chatbot's SQL.
+# Results are fetched as Arrow batches; the first page is available as soon as it arrives, the
+# rest is spilled to a local Parquet file in the background and paged in on demand. Chat history
+# keeps the small ResultHandle instead of the full DataFrame.
+import os
+import threading
+import time
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+
+from loader import SNAPSHOT_DIR
+from sql_cache import result_cache
+from tracing import span
+
+RESULT_DIR = os.path.join(SNAPSHOT_DIR, "results")
+RESULT_PAGE_ROWS = int(st.secrets.get("RESULT_PAGE_ROWS", 100))
+# Spilled results older than this are removed when new ones are written
+RESULT_SPILL_TTL_SECONDS = int(st.secrets.get("RESULT_SPILL_TTL_SECONDS", 24 * 3600))
+STREAM_RESULTS = bool(st.secrets.get("STREAM_RESULTS", True))
+
+
+class ResultHandle:
+    def __init__(self, sql):
+        self.id = uuid.uuid4().hex
+        self.sql = sql
+        self.path = os.path.join(RESULT_DIR, f"{self.id}.parquet")
+        self.first_page = None
+        self.row_count = 0
+        self.complete = False
+        self.error = None
+        self._first_page_ready = threading.Event()
+
+    @property
+    def page_count(self):
+        return max((self.row_count + RESULT_PAGE_ROWS - 1) // RESULT_PAGE_ROWS, 1)
+
+    def wait_for_first_page(self, timeout=None):
+        return self._first_page_ready.wait(timeout)
+
+    # Function to read one page back from the spill file (page 0 is kept in memory)
+    def page(self, number):
+        if number == 0 or self.row_count <= RESULT_PAGE_ROWS:
+            return self.first_page
+        if not self.complete:
+            return None
+        return pq.ParquetFile(self.path).read_row_group(number).to_pandas()
+
+    # Function to read the whole result back, e.g. for a download
+    def to_pandas(self):
+        if self.row_count <= RESULT_PAGE_ROWS or not self.complete:
+            return self.first_page
+        return pq.read_table(self.path).to_pandas()
+
+    def exists(self):
+        return not self.complete or self.row_count <= RESULT_PAGE_ROWS or os.path.exists(self.path)
+
+    # In-memory size, used by sql_cache to account for cached handles
+    @property
+    def nbytes(self):
+        if self.first_page is None:
+            return 0
+        return int(self.first_page.memory_usage(index=True, deep=True).sum())
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.pop("_first_page_ready")
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._first_page_ready = threading.Event()
+        self._first_page_ready.set()
+
+
+def _remove_old_spills():
+    if not os.path.isdir(RESULT_DIR):
+        return
+    cutoff = time.time() - RESULT_SPILL_TTL_SECONDS
+    for name in os.listdir(RESULT_DIR):
+        path = os.path.join(RESULT_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+# Function to split the incoming batches into exactly page-sized tables, so that
+# row group N of the spill file is page N. An empty result is one zero-row page (keeping the columns
+# of its empty batch), or None when the backend sent no batch at all.
+def _pages(batches, page_rows):
+    pending, pending_rows, pages = [], 0, 0
+    for batch in batches:
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        while pending_rows >= page_rows:
+            table = pa.Table.from_batches(pending)
+            yield table.slice(0, page_rows)
+            pages += 1
+            rest = table.slice(page_rows)
+            pending, pending_rows = rest.to_batches(), rest.num_rows
+    if pending_rows or not pages:
+        yield pa.Table.from_batches(pending) if pending else None
+
+
+def _fill(handle, batches):
+    writer = None
+    try:
+        for number, table in enumerate(_pages(batches, RESULT_PAGE_ROWS)):
+            if table is None:
+                break
+            if number == 0:
+                handle.first_page = table.to_pandas()
+                handle.row_count = table.num_rows
+                handle._first_page_ready.set()
+                first_table = table
+                continue
+            if writer is None:
+                # Only results bigger than one page are spilled; page 0 is rewritten to keep numbering aligned
+                os.makedirs(RESULT_DIR, exist_ok=True)
+                writer = pq.ParquetWriter(f"{handle.path}.tmp", first_table.schema)
+                writer.write_table(first_table, row_group_size=RESULT_PAGE_ROWS)
+            writer.write_table(table.cast(first_table.schema), row_group_size=RESULT_PAGE_ROWS)
+            handle.row_count += table.num_rows
+        if writer is not None:
+            writer.close()
+            writer = None
+            os.replace(f"{handle.path}.tmp", handle.path)
+        handle.complete = True
+    except Exception as e:
+        handle.error = e
+    finally:
+        if writer is not None:
+            writer.close()
+        if handle.first_page is None and handle.error is None:
+            # No batch at all (backends send an empty batch with the columns for an empty result)
+            handle.first_page = pd.DataFrame()
+        handle._first_page_ready.set()
+
+
+# Function to start streaming a query into a ResultHandle. Returns once the first page is in
+# (or the query failed); the remaining pages keep spilling to disk on a background thread.
+def stream_query(conn, sql, timeout=None, **query_kwargs):
+    _remove_old_spills()
+    handle = ResultHandle(sql)
+    batches = conn.query_batches(sql, timeout=timeout, **query_kwargs)
+    thread = threading.Thread(target=_fill, args=(handle, batches), name=f"result-{handle.id}", daemon=True)
+    thread.start()
+    handle.wait_for_first_page()
+    if handle.error is not None and handle.row_count == 0:
+        raise handle.error
+    return handle
+
+
+# Function to stream a query through the shared result cache; handles whose spill file is gone
+# or whose background fetch failed are fetched again
+def cached_stream_query(conn, sql, dataset_version, cache=result_cache, **query_kwargs):
+    with span("result_stream.query") as attributes:
+        key = cache.make_key(sql, dataset_version)
+        handle = cache.get(key)
+        attributes["cache"] = "hit"
+        if handle is None or handle.error is not None or not handle.exists():
+            attributes["cache"] = "miss"
+            handle = stream_query(conn, sql, **query_kwargs)
+            cache.put(key, handle)
+        attributes["first_page_rows"] = len(handle.first_page)
+        return handle
+
+
+# Function to render a handle: the current page plus a page picker once the rest has spilled.
+# `key` identifies the message showing it: the result cache hands the same handle to every repeat of
+# a query, so several messages can show one handle and each needs its own page picker.
+def render_result_handle(handle, key):
+    if handle.error is not None:
+        st.warning("Only part of the result could be loaded.")
+    if not handle.exists():
+        # The spill file was removed after RESULT_SPILL_TTL_SECONDS; only the first page is still in memory
+        st.dataframe(handle.first_page)
+        st.caption(f"Showing the first {len(handle.first_page)} of {handle.row_count} rows; "
+                   "run the question again to page through the rest.")
+    elif handle.page_count > 1 and handle.complete:
+        number = st.number_input(
+            f"Page (of {handle.page_count}, {handle.row_count} rows)", min_value=1,
+            max_value=handle.page_count, value=1, key=f"page_{key}",
+        )
+        st.dataframe(handle.page(number - 1))
+    else:
+        st.dataframe(handle.first_page)
+        if not handle.complete and handle.error is None:
+            st.caption("Loading the remaining rows...")
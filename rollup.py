@@ -0,0 +1,81 @@
+# Pre-aggregated rollup cube for the enrollment table.
+# The EDA, visualization and filter views are all slices of one STATE x LEVEL x REGIONAL CENTER
+# aggregate, so each rerun costs O(groups) instead of rescanning every row.
+import pandas as pd
+
+from caching import LRUCache
+from loader import dataset_version
+from tracing import span
+
+CUBE_DIMENSIONS = ["UNIVERSITY_STATE", "LEVEL", "REGIONAL_CENTER_STATE", "REGIONAL_CENTER_DISTRICT"]
+CUBE_MEASURES = ["TOTAL_MALE_ENROLLMENT", "TOTAL_FEMALE_ENROLLMENT", "TOTAL_ENROLLMENT"]
+ROW_COUNT = "ROW_COUNT"
+
+# One cube (and its describe() table) per dataset version, shared by every session of this process:
+# version -> {"cube": ..., "describe": ...}
+CUBE_CACHE_MAX_ENTRIES = 4
+_cube_cache = LRUCache(CUBE_CACHE_MAX_ENTRIES)
+
+
+# Function to aggregate the raw rows into the cube in a single vectorized groupby
+def build_rollup(data):
+    dimensions = [c for c in CUBE_DIMENSIONS if c in data.columns]
+    measures = [c for c in CUBE_MEASURES if c in data.columns]
+    grouped = data.groupby(dimensions, observed=True, dropna=False, sort=False)
+    cube = grouped[measures].sum()
+    cube[ROW_COUNT] = grouped.size()
+    return cube.reset_index()
+
+
+def _cached(data, part, build):
+    version = dataset_version(data)
+    entry = _cube_cache.get(version, {})
+    if part in entry:
+        return entry[part]
+    value = build(data)
+    _cube_cache.put(version, dict(_cube_cache.get(version, {}), **{part: value}))
+    return value
+
+
+def _build_cube(data):
+    with span("rollup.build", rows=len(data)) as attributes:
+        cube = build_rollup(data)
+        attributes["groups"] = len(cube)
+    return cube
+
+
+def _build_describe(data):
+    with span("rollup.describe", rows=len(data)):
+        return data.describe()
+
+
+# Function to fetch the cube for this dataset version, building it on first use
+def get_rollup(data):
+    return _cached(data, "cube", _build_cube)
+
+
+# Function to fetch data.describe() for this dataset version; the only statistics that need every row,
+# so they are computed once per version like the cube
+def get_describe(data):
+    return _cached(data, "describe", _build_describe)
+
+
+# Function to re-aggregate a slice of the cube, e.g. by=['LEVEL'] or by='UNIVERSITY_STATE'
+def rollup_slice(cube, by, measures=None, where=None):
+    if where:
+        mask = pd.Series(True, index=cube.index)
+        for column, value in where.items():
+            mask &= cube[column] == value
+        cube = cube[mask]
+    measures = measures or CUBE_MEASURES
+    return cube.groupby(by, observed=True)[measures].sum()
+
+
+# Function to count the source rows behind each value of a dimension (value_counts equivalent)
+def rollup_counts(cube, by):
+    return cube.groupby(by, observed=True)[ROW_COUNT].sum().sort_values(ascending=False).rename("count")
+
+
+# Function to get the grand total of a measure
+def rollup_total(cube, measure):
+    return cube[measure].sum()
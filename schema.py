@@ -0,0 +1,67 @@
+# Schema-aware normalization of the tables loaded from Snowflake into compact pandas dtypes
+import pandas as pd
+
+# Column kinds for the enrollment table: low-cardinality strings become categoricals,
+# enrollment figures become the smallest unsigned integer type that holds them
+ENROLLMENT_SCHEMA = {
+    "UNIVERSITY_NAME": "category",
+    "UNIVERSITY_STATE": "category",
+    "REGIONAL_CENTER_STATE": "category",
+    "REGIONAL_CENTER_DISTRICT": "category",
+    "LEVEL": "category",
+    "TOTAL_MALE_ENROLLMENT": "count",
+    "TOTAL_FEMALE_ENROLLMENT": "count",
+    "TOTAL_ENROLLMENT": "count",
+}
+
+# Column kinds for the ACARA schools list (names are nearly unique and coordinates feed distance
+# calculations, so both keep their loaded dtypes)
+SCHOOLS_SCHEMA = {
+    "SUBURB": "category",
+    "STATE": "category",
+    "POSTCODE": "count",
+    "SECTOR": "category",
+    "STATUS": "category",
+}
+
+
+def _compact_counts(column):
+    column = pd.to_numeric(column, errors="coerce")
+    if column.isna().any():
+        # Missing counts: keep them as NaN-able floats, just narrower
+        return pd.to_numeric(column, downcast="float")
+    if len(column) and column.min() < 0:
+        return pd.to_numeric(column, downcast="integer")
+    return pd.to_numeric(column, downcast="unsigned")
+
+
+# Function to measure the deep memory footprint of a frame in bytes
+def memory_footprint(data):
+    return int(data.memory_usage(index=True, deep=True).sum())
+
+
+# Function to convert a frame to the compact dtypes described by the schema.
+# The before/after footprint is kept in data.attrs["memory_report"].
+def normalize_frame(data, schema=ENROLLMENT_SCHEMA):
+    # A frame restored from a normalized snapshot remembers its original size
+    before = data.attrs.get("memory_report", {}).get("before_bytes") or memory_footprint(data)
+    converted = {}
+    for column, kind in schema.items():
+        if column not in data.columns:
+            continue
+        if kind == "category" and not isinstance(data[column].dtype, pd.CategoricalDtype):
+            converted[column] = data[column].astype("category")
+        elif kind == "count":
+            converted[column] = _compact_counts(data[column])
+    normalized = data.assign(**converted) if converted else data
+    normalized.attrs = dict(data.attrs)
+    normalized.attrs["memory_report"] = {"before_bytes": before, "after_bytes": memory_footprint(normalized)}
+    return normalized
+
+
+# Function to describe the memory saving in a human readable way
+def format_memory_report(report):
+    before_mb = report["before_bytes"] / 1024 ** 2
+    after_mb = report["after_bytes"] / 1024 ** 2
+    saved = 100 * (1 - report["after_bytes"] / report["before_bytes"]) if report["before_bytes"] else 0
+    return f"In-memory size: {before_mb:.2f} MB -> {after_mb:.2f} MB ({saved:.0f}% smaller)"
@@ -0,0 +1,166 @@
+# Shared result cache for the SQL the chatbot executes.
+# Keyed on normalized SQL text plus the dataset version, with byte-bounded LRU eviction and a TTL.
+import re
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+
+import streamlit as st
+
+from tracing import span
+
+SQL_CACHE_MAX_BYTES = int(st.secrets.get("SQL_CACHE_MAX_BYTES", 256 * 1024 ** 2))
+SQL_CACHE_TTL_SECONDS = int(st.secrets.get("SQL_CACHE_TTL_SECONDS", 600))
+
+# Tokens: comments, string literals, quoted identifiers, numbers, words, anything else
+_TOKEN_RE = re.compile(r"""
+    (?P<comment>--[^\n]*|/\*.*?\*/)
+  | (?P<string>'(?:[^']|'')*'|\$\$.*?\$\$)
+  | (?P<quoted>"(?:[^"]|"")*")
+  | (?P<number>\b\d+(?:\.\d*)?(?:[eE][+-]?\d+)?\b|\.\d+(?:[eE][+-]?\d+)?\b)
+  | (?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+  | (?P<space>\s+)
+  | (?P<other>.)
+""", re.VERBOSE | re.DOTALL)
+
+
+_TIGHT = {"(", ")", ",", ".", ";"}
+_TIGHT_AFTER = "(."
+
+
+def _canonical_number(text):
+    try:
+        value = Decimal(text).normalize()
+    except InvalidOperation:
+        return text
+    return format(value, "f") if value == value.to_integral() else str(value)
+
+
+def _canonical_string(text):
+    if text.startswith("$$"):
+        body = text[2:-2]
+    else:
+        body = text[1:-1].replace("''", "'")
+    return "'" + body.replace("'", "''") + "'"
+
+
+# Function to normalize SQL so trivially different spellings of a query share one cache entry:
+# comments and redundant whitespace removed, unquoted keywords/identifiers upper-cased,
+# string literals re-quoted uniformly (their contents are case-sensitive and kept), numbers canonicalized
+def normalize_sql(sql):
+    tokens = []
+    for match in _TOKEN_RE.finditer(sql):
+        kind, text = match.lastgroup, match.group()
+        if kind in ("comment", "space"):
+            continue
+        if kind == "word":
+            tokens.append(text.upper())
+        elif kind == "number":
+            tokens.append(_canonical_number(text))
+        elif kind == "string":
+            tokens.append(_canonical_string(text))
+        else:
+            tokens.append(text)
+    while tokens and tokens[-1] == ";":
+        tokens.pop()
+    # Re-join with single spaces, without spaces around punctuation
+    normalized = ""
+    for token in tokens:
+        if normalized and token not in _TIGHT and normalized[-1] not in _TIGHT_AFTER:
+            normalized += " "
+        normalized += token
+    return normalized
+
+
+def _frame_bytes(frame):
+    try:
+        return int(frame.memory_usage(index=True, deep=True).sum())
+    except AttributeError:
+        # Non-DataFrame results (e.g. result_stream.ResultHandle) report their own size
+        return int(getattr(frame, "nbytes", 0))
+
+
+class ResultCache:
+    def __init__(self, max_bytes=SQL_CACHE_MAX_BYTES, ttl_seconds=SQL_CACHE_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (frame, size, stored_at)
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(sql, dataset_version):
+        return (normalize_sql(sql), dataset_version)
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.total_bytes -= size
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[2] > self.ttl_seconds:
+                self._drop(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, frame):
+        size = _frame_bytes(frame)
+        if size > self.max_bytes:
+            # Larger than the whole budget: never worth caching
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (frame, size, time.monotonic())
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+# One cache per server process, shared by every session
+result_cache = ResultCache()
+
+
+# Function to run a query through the shared cache. Only successful results are cached.
+# Extra keyword arguments (e.g. timeout) are passed on to the cursor's execute.
+def cached_query(conn, sql, dataset_version, cache=result_cache, **query_kwargs):
+    with span("sql_cache.query") as attributes:
+        key = cache.make_key(sql, dataset_version)
+        frame = cache.get(key)
+        attributes["cache"] = "hit" if frame is not None else "miss"
+        if frame is None:
+            frame = conn.query(sql, ttl=0, show_spinner=False, **query_kwargs)
+            cache.put(key, frame)
+        attributes["rows"] = len(frame)
+        return frame
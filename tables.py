@@ -0,0 +1,10 @@
+# Snowflake tables behind the app, in one place for the prompts, the loaders and the analysis engines
+import streamlit as st
+
+# Two schema paths for two different databases and tables
+SCHEMA_PATH_1 = st.secrets.get("SCHEMA_PATH_1", "HACKATHONS.EDUCATION_ANALYSIS")
+SCHEMA_PATH_2 = st.secrets.get("SCHEMA_PATH_2", "EDUCATION__LOCATIONS__INSIGHTS__AUSTRALIA.EDUCATION_AUS_FREE")
+
+# Table names
+QUALIFIED_TABLE_NAME_1 = f"{SCHEMA_PATH_1}.EDUCATIONAL_ENTITY_ENROLLMENT_SUMMARY"
+QUALIFIED_TABLE_NAME_2 = f"{SCHEMA_PATH_2}.ACARA_AUSTRALIAN_SCHOOLS_LIST"
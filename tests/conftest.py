@@ -0,0 +1,37 @@
+# Test setup: the app modules read their settings from st.secrets at import time, so the tests run
+# from a scratch directory with its own .streamlit/secrets.toml (SQLite backend, caches in the scratch
+# directory) before any of them is imported.
+import os
+import sqlite3
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_scratch = tempfile.mkdtemp(prefix="eduregion-tests-")
+os.makedirs(os.path.join(_scratch, ".streamlit"))
+with open(os.path.join(_scratch, ".streamlit", "secrets.toml"), "w") as f:
+    f.write(
+        'EXECUTOR_BACKEND = "sqlite"\n'
+        'SQLITE_PATH = "file:eduregion-tests?mode=memory&cache=shared"\n'
+        f'SNAPSHOT_DIR = "{os.path.join(_scratch, "cache")}"\n'
+    )
+os.chdir(_scratch)
+
+
+# A fresh shared in-memory sqlite database and an executor on it; `executor.db` keeps the database
+# alive and is used to create the tables, e.g. frame.to_sql("DB.SCHEMA.TABLE", executor.db, index=False)
+@pytest.fixture
+def sqlite_executor():
+    from executor import QueryExecutor, SQLiteBackend
+
+    backend = SQLiteBackend(f"file:test-{uuid.uuid4().hex}?mode=memory&cache=shared")
+    executor = QueryExecutor(backend, pool_size=4, max_concurrent=4, per_session=2, max_queued=8,
+                             queue_timeout=5, query_timeout=10)
+    executor.db = sqlite3.connect(backend.path, uri=True, check_same_thread=False)
+    yield executor
+    executor.db.close()
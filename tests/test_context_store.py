@@ -0,0 +1,31 @@
+import pandas as pd
+
+import context_store
+
+
+# Connection without a usable version query (e.g. no access to INFORMATION_SCHEMA.TABLES)
+class UnversionedConn:
+    def __init__(self, columns):
+        self.columns = columns
+
+    def query(self, sql, **kwargs):
+        if "ROW_COUNT" in sql:
+            raise RuntimeError("version query failed")
+        if "COLUMN_NAME" in sql:
+            return pd.DataFrame({"COLUMN_NAME": self.columns, "DATA_TYPE": ["TEXT"] * len(self.columns)})
+        return pd.DataFrame({"LEVEL": ["UG"], "N": [1]})
+
+
+def render(columns, metadata):
+    return ", ".join(c["COLUMN_NAME"] for c in columns)
+
+
+def test_unversioned_record_is_rebuilt_when_the_schema_changes():
+    table = "DB.PUBLIC.UNVERSIONED_CONTEXT"
+    first = context_store.refresh_record(UnversionedConn(["A"]), table, "table", "SELECT LEVEL", render)
+    assert first["version"] == "unversioned"
+
+    second = context_store.refresh_record(UnversionedConn(["A", "B"]), table, "table", "SELECT LEVEL", render, first)
+
+    assert second["context"] == "A, B"
+    assert second["fingerprint"] != first["fingerprint"]
@@ -0,0 +1,42 @@
+from context_window import build_context_window, count_tokens
+
+
+def conversation(turns):
+    messages = [{"role": "system", "content": "You are EduRegion Explorer."}]
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"Question {i} about universities in Kerala"})
+        messages.append({"role": "assistant", "content": f"Answer {i} " + "SELECT * FROM T; " * 20})
+    return messages
+
+
+def test_short_conversation_is_sent_whole():
+    messages = conversation(2)
+
+    window, report = build_context_window(messages, token_budget=10000)
+
+    assert window == messages
+    assert report["dropped_messages"] == 0
+    assert report["saved_tokens"] == 0
+
+
+def test_long_conversation_is_windowed_and_summarized():
+    messages = conversation(20)
+
+    window, report = build_context_window(messages, token_budget=1000, max_messages=6)
+
+    assert window[0] == messages[0]
+    assert window[-1] == messages[-1]
+    assert window[1]["role"] == "system" and "Question 0" in window[1]["content"]
+    assert len(window) <= 1 + 1 + 6
+    assert report["dropped_messages"] == len(messages) - 1 - (len(window) - 2)
+    assert report["sent_tokens"] <= 1000
+    assert report["saved_tokens"] > 0
+
+
+def test_latest_message_is_kept_over_budget():
+    messages = [{"role": "user", "content": "word " * 500}]
+
+    window, _ = build_context_window(messages, token_budget=50, summarize=False)
+
+    assert window == messages
+    assert count_tokens(messages[0]["content"]) > 50
@@ -0,0 +1,118 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+from pandas.errors import DatabaseError
+
+from executor import QueryExecutor, QueryRejected, SQLiteBackend, sqlite_sql
+
+TABLE = "DB.PUBLIC.NUMBERS"
+
+
+# SQLite backend whose queries block until released, counting how many run at once
+class GatedBackend(SQLiteBackend):
+    def __init__(self, path):
+        super().__init__(path)
+        self.release = threading.Event()
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def run(self, conn, sql, params, timeout):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            self.release.wait(5)
+            return super().run(conn, sql, params, timeout)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+def gated_executor(sqlite_executor, **limits):
+    backend = GatedBackend(sqlite_executor.backend.path)
+    settings = dict(pool_size=8, max_concurrent=8, per_session=8, max_queued=16, queue_timeout=5)
+    settings.update(limits)
+    return QueryExecutor(backend, **settings)
+
+
+def run_concurrently(executor, session_ids):
+    errors = []
+
+    def run(session_id):
+        try:
+            executor.query("SELECT 1 AS N", session_id=session_id)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(s,)) for s in session_ids]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.3)
+    executor.backend.release.set()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+def test_query_reads_three_part_names(sqlite_executor):
+    pd.DataFrame({"N": [1, 2, 3]}).to_sql(TABLE, sqlite_executor.db, index=False)
+
+    result = sqlite_executor.query(f"SELECT SUM(N) AS TOTAL FROM {TABLE} WHERE N > %(n)s", params={"n": 1})
+
+    assert result["TOTAL"].tolist() == [5]
+
+
+def test_sqlite_sql_rewrites_names_and_placeholders():
+    sql = sqlite_sql("SELECT 'a.b.c', t.col FROM db.s.t t WHERE x = %(x)s")
+
+    assert sql == """SELECT 'a.b.c', t.col FROM "DB.S.T" t WHERE x = :x"""
+
+
+def test_per_session_cap(sqlite_executor):
+    executor = gated_executor(sqlite_executor, per_session=2)
+
+    assert run_concurrently(executor, ["one"] * 4) == []
+    assert executor.backend.peak == 2
+
+
+def test_global_cap(sqlite_executor):
+    executor = gated_executor(sqlite_executor, max_concurrent=3)
+
+    assert run_concurrently(executor, [f"session-{i}" for i in range(6)]) == []
+    assert executor.backend.peak == 3
+
+
+def test_full_queue_rejects_queries(sqlite_executor):
+    executor = gated_executor(sqlite_executor, max_concurrent=1, max_queued=2)
+
+    errors = run_concurrently(executor, [f"session-{i}" for i in range(5)])
+
+    # One query runs, two wait, the other two are turned away
+    assert len(errors) == 2
+    assert all(isinstance(e, QueryRejected) for e in errors)
+    assert executor.rejected == 2
+    assert executor.metrics_summary()["queries"] == 3
+
+
+def test_query_timeout(sqlite_executor):
+    endless = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT COUNT(*) FROM n"
+
+    started = time.monotonic()
+    with pytest.raises(DatabaseError, match="interrupted"):
+        sqlite_executor.query(endless, timeout=0.2)
+
+    assert time.monotonic() - started < 5
+    assert sqlite_executor.failed == 1
+    # The connection goes back to the pool and keeps working
+    assert sqlite_executor.query("SELECT 1 AS N")["N"].tolist() == [1]
+
+
+def test_longest_waits_hide_sessions_and_sql(sqlite_executor):
+    sqlite_executor.query("SELECT 1 AS N", session_id="someone-else")
+
+    waits = sqlite_executor.longest_waits()
+
+    assert list(waits.columns) == ["queue_wait_s", "execution_s", "rows"]
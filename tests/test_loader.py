@@ -0,0 +1,38 @@
+import pandas as pd
+
+import loader
+from tracing import finish_trace, start_trace
+
+TABLE = "DB.PUBLIC.ENROLLMENT"
+
+
+def load(executor):
+    trace = start_trace("test")
+    data = loader.load_table(TABLE, columns=["NAME", "N"], conn=executor)
+    finish_trace()
+    source = next(s for s in trace.spans if s["name"] == "loader.load_table")["attributes"]["source"]
+    return data, source
+
+
+def test_load_table_goes_memory_then_snapshot_then_warehouse(sqlite_executor):
+    pd.DataFrame({"NAME": ["a", "b"], "N": [1, 2], "UNUSED": [0, 0]}).to_sql(TABLE, sqlite_executor.db, index=False)
+    loader.invalidate(TABLE)
+
+    data, source = load(sqlite_executor)
+    assert source == "warehouse"
+    assert list(data.columns) == ["NAME", "N"]
+
+    assert load(sqlite_executor)[1] == "memory"
+
+    # A new worker (empty memory cache) starts from the Parquet snapshot
+    loader.invalidate(TABLE)
+    data, source = load(sqlite_executor)
+    assert source == "snapshot"
+    assert data["N"].tolist() == [1, 2]
+
+    # The table changed: sqlite has no change tracking, so it is reloaded in full
+    pd.DataFrame({"NAME": ["c"], "N": [3], "UNUSED": [0]}).to_sql(TABLE, sqlite_executor.db, index=False, if_exists="append")
+    loader.invalidate(TABLE)
+    data, source = load(sqlite_executor)
+    assert source == "warehouse"
+    assert data["N"].tolist() == [1, 2, 3]
@@ -0,0 +1,65 @@
+import pandas as pd
+
+from pushdown import PandasEngine, WarehouseEngine, get_engine
+from quality import clean_frame
+from tracing import finish_trace, start_trace
+
+
+class FailingConn:
+    def query(self, sql, **kwargs):
+        raise RuntimeError("warehouse unavailable")
+
+
+def enrollment():
+    data = pd.DataFrame({
+        "UNIVERSITY_NAME": ["A University", "A University", "B University"],
+        "UNIVERSITY_STATE": ["Kerala", "Kerala", "Goa"],
+        "REGIONAL_CENTER_STATE": ["Kerala", "Kerala", "Goa"],
+        "REGIONAL_CENTER_DISTRICT": ["D1", "D1", "D2"],
+        "LEVEL": ["UG", "UG", "PG"],
+        "TOTAL_MALE_ENROLLMENT": [10, 10, 5],
+        "TOTAL_FEMALE_ENROLLMENT": [20, 20, 5],
+        "TOTAL_ENROLLMENT": [30, 30, 10],
+    })
+    data.attrs["dataset_version"] = "test-pushdown"
+    return data
+
+
+def test_failed_warehouse_query_falls_back_and_is_recorded():
+    engine = WarehouseEngine(conn=FailingConn(), fallback=PandasEngine(enrollment()))
+
+    trace = start_trace("test")
+    totals = engine.totals(["TOTAL_ENROLLMENT"])
+    finish_trace()
+
+    assert totals == {"TOTAL_ENROLLMENT": 70}
+    span = next(s for s in trace.spans if s["name"] == "pushdown.query")
+    assert span["attributes"]["fallback"] == "pandas"
+    assert span["attributes"]["fallback_error"] == "RuntimeError"
+
+
+def test_cleaned_frames_are_not_pushed_down():
+    data = enrollment()
+    cleaned, _ = clean_frame(data)
+
+    assert isinstance(get_engine(data, "warehouse"), WarehouseEngine)
+    assert isinstance(get_engine(cleaned, "warehouse"), PandasEngine)
+
+
+def test_warehouse_and_pandas_engines_agree(sqlite_executor):
+    data = enrollment()
+    table = "DB.PUBLIC.ENROLLMENT_PARITY"
+    data.to_sql(table, sqlite_executor.db, index=False)
+    local, warehouse = PandasEngine(data), WarehouseEngine(table_name=table, conn=sqlite_executor)
+    measures = ["TOTAL_MALE_ENROLLMENT", "TOTAL_ENROLLMENT"]
+
+    assert warehouse.totals(measures) == local.totals(measures)
+    assert sorted(warehouse.distinct("UNIVERSITY_STATE")) == sorted(local.distinct("UNIVERSITY_STATE"))
+    assert warehouse.counts("UNIVERSITY_STATE").sort_index().to_dict() == local.counts("UNIVERSITY_STATE").sort_index().to_dict()
+    for where in [None, {"UNIVERSITY_STATE": "Kerala"}]:
+        pd.testing.assert_frame_equal(
+            warehouse.group_sum("LEVEL", measures, where=where).sort_index(),
+            local.group_sum("LEVEL", measures, where=where).sort_index(),
+            check_dtype=False,
+        )
+    assert len(warehouse.rows({"UNIVERSITY_STATE": "Kerala"})) == len(local.rows({"UNIVERSITY_STATE": "Kerala"}))
@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+
+from quality import FEMALE, MALE, TOTAL, clean_frame
+
+
+def test_derived_totals_do_not_overflow_compact_counts():
+    # Normalized counts below 65536 are uint16; their sum must not wrap around
+    data = pd.DataFrame({
+        "UNIVERSITY_NAME": ["A University", "B University"],
+        MALE: np.array([40000, 65535], dtype="uint16"),
+        FEMALE: np.array([30000, 65535], dtype="uint16"),
+        TOTAL: [np.nan, 5.0],
+    })
+    data.attrs["dataset_version"] = "test-overflow"
+
+    cleaned, report = clean_frame(data)
+
+    assert report["imputed_totals"] == 1
+    assert cleaned[TOTAL].tolist() == [70000, 5]
+    assert report["inconsistent_totals"] == 1
@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+
+from response_cache import ResponseCache, store_response, stream_response
+
+
+# Stand-in for the OpenAI client: streams a fixed answer and counts the completions requested
+class StubClient:
+    def __init__(self, answer):
+        self.answer = answer
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, stream):
+        self.calls += 1
+        for start in range(0, len(self.answer), 5):
+            delta = SimpleNamespace(content=self.answer[start:start + 5])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+def ask(question):
+    return [{"role": "system", "content": "prompt"}, {"role": "user", "content": question}]
+
+
+def answer(client, messages, cache, dataset="Universities"):
+    return "".join(stream_response(client, messages, dataset, cache=cache))
+
+
+def test_stored_answer_is_replayed():
+    cache, client = ResponseCache(similarity=1.0), StubClient("SELECT 1")
+    messages = ask("How many universities are in Kerala?")
+
+    store_response(messages, "Universities", answer(client, messages, cache), succeeded=True, cache=cache)
+    assert answer(client, ask("how many universities are in kerala"), cache) == "SELECT 1"
+
+    assert client.calls == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_other_dataset_or_turn_misses():
+    cache, client = ResponseCache(similarity=1.0), StubClient("SELECT 1")
+    messages = ask("How many universities are in Kerala?")
+    store_response(messages, "Universities", answer(client, messages, cache), succeeded=True, cache=cache)
+
+    answer(client, messages, cache, dataset="Schools")
+    follow_up = messages + [{"role": "assistant", "content": "12"}, {"role": "user", "content": "How many universities are in Kerala?"}]
+    answer(client, follow_up, cache)
+
+    assert client.calls == 3
+
+
+def test_failed_answer_is_evicted():
+    cache, client = ResponseCache(similarity=1.0), StubClient("SELECT 1")
+    messages = ask("How many universities are in Kerala?")
+    store_response(messages, "Universities", answer(client, messages, cache), succeeded=True, cache=cache)
+
+    # The replayed SQL failed this time: it must not be served again
+    store_response(messages, "Universities", answer(client, messages, cache), succeeded=False, cache=cache)
+    answer(client, messages, cache)
+
+    assert client.calls == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_fuzzy_match_requires_the_same_content_words():
+    cache, client = ResponseCache(similarity=0.8), StubClient("SELECT 1")
+    messages = ask("Top 10 universities in Kerala by male enrollment")
+    store_response(messages, "Universities", answer(client, messages, cache), succeeded=True, cache=cache)
+
+    # A rewording with the same content words is a hit
+    assert answer(client, ask("Show the top 10 universities in Kerala by male enrollment"), cache) == "SELECT 1"
+    assert client.calls == 1
+
+    # Near misses in spelling are different questions
+    for question in ["Top 10 universities in Kerala by female enrollment",
+                     "Top 20 universities in Kerala by male enrollment"]:
+        answer(client, ask(question), cache)
+    assert client.calls == 3
+
+    store_response(ask("Enrollment at Alagappa University"), "Universities", "SELECT 2", succeeded=True, cache=cache)
+    assert answer(client, ask("Enrollment at Andhra University"), cache) == "SELECT 1"
+    assert client.calls == 4
@@ -0,0 +1,58 @@
+import os
+import time
+
+import pandas as pd
+from streamlit.testing.v1 import AppTest
+
+import result_stream
+from result_stream import stream_query
+
+TABLE = "DB.PUBLIC.RESULTS"
+PAGE = result_stream.RESULT_PAGE_ROWS
+
+
+# The remaining pages are spilled on a background thread
+def wait_for_spill(handle, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not handle.complete and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert handle.complete
+
+
+def test_empty_result_keeps_its_columns(sqlite_executor):
+    pd.DataFrame({"NAME": ["a", "b"], "N": [1, 2]}).to_sql(TABLE, sqlite_executor.db, index=False)
+
+    handle = stream_query(sqlite_executor, f"SELECT NAME, N FROM {TABLE} WHERE N > 5")
+
+    assert handle.row_count == 0
+    assert list(handle.first_page.columns) == ["NAME", "N"]
+
+
+def test_result_is_paged_through_the_spill_file(sqlite_executor):
+    rows = PAGE * 2 + 1
+    pd.DataFrame({"N": range(rows)}).to_sql(TABLE, sqlite_executor.db, index=False)
+
+    handle = stream_query(sqlite_executor, f"SELECT N FROM {TABLE} ORDER BY N")
+    wait_for_spill(handle)
+
+    assert handle.page_count == 3
+    assert handle.page(2)["N"].tolist() == [rows - 1]
+
+
+def render_expired(handle):
+    from result_stream import render_result_handle
+
+    render_result_handle(handle, "expired")
+
+
+def test_expired_spill_file_falls_back_to_the_first_page(sqlite_executor):
+    pd.DataFrame({"N": range(PAGE * 2)}).to_sql(TABLE, sqlite_executor.db, index=False)
+    handle = stream_query(sqlite_executor, f"SELECT N FROM {TABLE}")
+    wait_for_spill(handle)
+    os.remove(handle.path)
+
+    app = AppTest.from_function(render_expired, args=(handle,)).run()
+
+    assert not app.exception
+    assert not app.number_input
+    assert f"first {PAGE} of {PAGE * 2} rows" in app.caption[0].value
@@ -0,0 +1,11 @@
+from sql_cache import normalize_sql
+
+
+def test_spelling_differences_share_one_key():
+    assert normalize_sql("select  a, b\nfrom t -- latest\nwhere n >= 1.50;") == normalize_sql("SELECT A,B FROM T WHERE N >= 1.5")
+    assert normalize_sql("SELECT /* all */ * FROM T") == normalize_sql("select * from t")
+
+
+def test_string_literals_keep_their_case():
+    assert normalize_sql("SELECT * FROM T WHERE S = 'Kerala'") != normalize_sql("SELECT * FROM T WHERE S = 'kerala'")
+    assert normalize_sql("SELECT * FROM T WHERE S = $$it's$$") == normalize_sql("SELECT * FROM T WHERE S = 'it''s'")
@@ -0,0 +1,29 @@
+from streamlit.testing.v1 import AppTest
+
+from response_cache import ResponseCache
+from sql_cache import ResultCache
+from tracing import finish_trace, span, start_trace
+
+
+def render_panel(trace, caches):
+    from tracing import render_trace_panel
+
+    render_trace_panel(trace, caches=caches)
+
+
+def test_panel_shows_cache_stats():
+    responses, results = ResponseCache(), ResultCache()
+    responses.get("Universities", "How many universities are in Kerala?")
+    results.put(results.make_key("SELECT 1", "v1"), None)
+    trace = start_trace("test")
+    with span("stage"):
+        pass
+    finish_trace()
+
+    app = AppTest.from_function(render_panel, args=(trace, {"SQL results": results, "Chat responses": responses})).run()
+
+    assert not app.exception
+    stats = app.dataframe[-1].value
+    assert list(stats.index) == ["SQL results", "Chat responses"]
+    assert stats.loc["Chat responses", "misses"] == 1
+    assert stats.loc["SQL results", "entries"] == 1
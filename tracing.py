@@ -0,0 +1,217 @@
+# Lightweight tracing for the hot paths of a Streamlit rerun.
+# Spans record wall time plus attributes (rows, bytes, cache hit/miss); each rerun's spans form one
+# trace that can be shown in an opt-in sidebar panel and exported as OTLP-style JSON lines.
+# A span costs two perf_counter_ns calls and a list append, so it is safe to leave on.
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import queue
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+
+TRACE_EXPORT_PATH = st.secrets.get("TRACE_EXPORT_PATH", "")
+# The profiling panel shows process-wide metrics, so it is only offered when this is set
+TRACE_PANEL = bool(st.secrets.get("TRACE_PANEL", False))
+SERVICE_NAME = "eduregion-explorer"
+
+_current_trace = contextvars.ContextVar("eduregion_trace", default=None)
+_current_span = contextvars.ContextVar("eduregion_span", default=None)
+
+
+class Trace:
+    def __init__(self, name):
+        self.name = name
+        self.trace_id = os.urandom(16).hex()
+        self.started_ns = time.time_ns()
+        self.spans = []
+
+    def summary(self):
+        rows = []
+        for s in self.spans:
+            rows.append({
+                "span": ("  " * s["depth"]) + s["name"],
+                "ms": round((s["end_ns"] - s["start_ns"]) / 1e6, 2),
+                **{k: v for k, v in s["attributes"].items()},
+            })
+        return rows
+
+
+# Function to open a span; the yielded dict can be filled with attributes inside the block
+@contextlib.contextmanager
+def span(name, **attributes):
+    trace = _current_trace.get()
+    parent = _current_span.get()
+    record = {
+        "name": name,
+        "span_id": os.urandom(8).hex(),
+        "parent_id": parent["span_id"] if parent else None,
+        "depth": parent["depth"] + 1 if parent else 0,
+        "attributes": attributes,
+    }
+    token = _current_span.set(record)
+    start = time.perf_counter_ns()
+    record["start_ns"] = time.time_ns()
+    try:
+        yield attributes
+    except Exception as e:
+        attributes["error"] = type(e).__name__
+        raise
+    finally:
+        record["end_ns"] = record["start_ns"] + (time.perf_counter_ns() - start)
+        _current_span.reset(token)
+        if trace is not None:
+            trace.spans.append(record)
+
+
+# Decorator form of span(); records the row count when the first argument is a DataFrame
+def traced(name):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            attributes = {}
+            if args and hasattr(args[0], "shape"):
+                attributes["rows"] = args[0].shape[0]
+            with span(name, **attributes):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Function to begin the trace of the current rerun
+def start_trace(name):
+    trace = Trace(name)
+    _current_trace.set(trace)
+    _current_span.set(None)
+    return trace
+
+
+# Function to close the current trace: spans are sorted by start time and handed to the exporter
+def finish_trace():
+    trace = _current_trace.get()
+    if trace is None:
+        return None
+    trace.spans.sort(key=lambda s: s["start_ns"])
+    _current_trace.set(None)
+    if TRACE_EXPORT_PATH:
+        _exporter().submit(trace)
+    return trace
+
+
+# Function to add an already measured span, e.g. for work spread over a generator's lifetime
+def record_span(name, start_ns, end_ns, **attributes):
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    parent = _current_span.get()
+    trace.spans.append({
+        "name": name,
+        "span_id": os.urandom(8).hex(),
+        "parent_id": parent["span_id"] if parent else None,
+        "depth": parent["depth"] + 1 if parent else 0,
+        "attributes": attributes,
+        "start_ns": start_ns,
+        "end_ns": end_ns,
+    })
+
+
+# Function to run a callable in another thread within the current trace (for executors/threads)
+def bind_context(func, *args, **kwargs):
+    context = contextvars.copy_context()
+    return lambda: context.run(func, *args, **kwargs)
+
+
+def _attribute(key, value):
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+# Function to convert a trace to an OTLP/JSON "resourceSpans" document
+def to_otlp(trace):
+    return {"resourceSpans": [{
+        "resource": {"attributes": [_attribute("service.name", SERVICE_NAME)]},
+        "scopeSpans": [{
+            "scope": {"name": "eduregion.tracing"},
+            "spans": [{
+                "traceId": trace.trace_id,
+                "spanId": s["span_id"],
+                "parentSpanId": s["parent_id"] or "",
+                "name": s["name"],
+                "kind": 1,
+                "startTimeUnixNano": str(s["start_ns"]),
+                "endTimeUnixNano": str(s["end_ns"]),
+                "attributes": [_attribute("rerun", trace.name)]
+                              + [_attribute(k, v) for k, v in s["attributes"].items()],
+            } for s in trace.spans],
+        }],
+    }]}
+
+
+# Background writer: traces are appended to the export file as one JSON line each, off the script thread
+class FileExporter:
+    def __init__(self, path):
+        self.path = path
+        self._queue = queue.Queue(maxsize=1000)
+        threading.Thread(target=self._run, name="trace-exporter", daemon=True).start()
+
+    def submit(self, trace):
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            pass  # never block a rerun on tracing
+
+    def _run(self):
+        while True:
+            traces = [self._queue.get()]
+            while not self._queue.empty() and len(traces) < 100:
+                traces.append(self._queue.get_nowait())
+            try:
+                with open(self.path, "a") as f:
+                    for trace in traces:
+                        f.write(json.dumps(to_otlp(trace)) + "\n")
+            except OSError:
+                pass
+
+
+_exporter_instance = None
+_exporter_lock = threading.Lock()
+
+
+def _exporter():
+    global _exporter_instance
+    with _exporter_lock:
+        if _exporter_instance is None:
+            _exporter_instance = FileExporter(TRACE_EXPORT_PATH)
+        return _exporter_instance
+
+
+# Function to show the spans of a finished rerun in the sidebar (opt-in). With `executor` (the shared
+# QueryExecutor), its process-wide queue/execution percentiles and longest recent waits are shown too,
+# so a queuing spike can be told apart from slow queries. `caches` maps a label to any cache with a
+# stats() method (e.g. sql_cache.result_cache); their hit/miss counters are shown in one table.
+def render_trace_panel(trace, executor=None, caches=None):
+    if trace is None:
+        return
+    with st.sidebar.expander("Profiling (this rerun)"):
+        total_ms = sum(s["end_ns"] - s["start_ns"] for s in trace.spans if s["depth"] == 0) / 1e6
+        st.caption(f"{len(trace.spans)} spans, {total_ms:.1f} ms in traced stages")
+        st.dataframe(pd.DataFrame(trace.summary()))
+        if executor is not None:
+            st.caption("Query executor (all sessions, recent queries)")
+            summary = executor.metrics_summary()
+            st.dataframe(pd.DataFrame({"value": [str(v) for v in summary.values()]}, index=list(summary)))
+            st.dataframe(executor.longest_waits())
+        if caches:
+            st.caption("Caches (all sessions, since the server started)")
+            st.dataframe(pd.DataFrame({label: cache.stats() for label, cache in caches.items()}).T)
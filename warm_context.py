@@ -0,0 +1,6 @@
+# Pre-build the persisted system-prompt context and entity index for every dataset, e.g. in a deploy step:
+#   python warm_context.py
+from prompts import warm_context_store
+
+if __name__ == "__main__":
+    warm_context_store()